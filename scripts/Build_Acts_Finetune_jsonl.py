@@ -1,57 +1,52 @@
-import json, re
+import os
 from pathlib import Path
 
+from chunk_quality import acts_drop_masks
+from finetune_builder import build
+from pretokenize import pretokenize
+from near_dedup import duplicates_path, load_duplicates
+
 IN_PATH = Path("../Dataset_Acts_Stage_1/chunks.jsonl")  # or your local path
 OUT_DIR = Path("../Dataset_Acts_Finetune")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# detect table-like chunks (many numbers/symbols)
-def is_table_like(text: str) -> bool:
-    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-    if len(lines) < 4:
-        return False
-    numericish = sum(1 for ln in lines if re.fullmatch(r"[\d\W_]+", ln))
-    return numericish / len(lines) >= 0.6
-
-def make_summary_row(chunk_id, text):
-    return {
-        "id": chunk_id,
-        "task": "simplify_summary",
+
+# keep one chunk per near-duplicate cluster (run near_dedup.py first)
+DROP_NEAR_DUPLICATES = True
+
+# chunks are filtered in worker processes, at most FINETUNE_WINDOW batches at a time
+FINETUNE_WORKERS = os.cpu_count() or 1
+FINETUNE_WINDOW = 4 * FINETUNE_WORKERS
+
+# train/val/test by a stable hash of doc_id: all rows of a document land in one split
+SPLITS = {"train": 0.8, "val": 0.1, "test": 0.1}
+
+# set to the training model's local tokenizer.json to also write OUT_DIR/pretokenized/
+# (prompt-formatted token ids, loss masks and offsets as memmap arrays, see pretokenize.py)
+PRETOKENIZE_WITH = None
+
+# one row per task for every kept chunk; the instruction is stored once in OUT_DIR/instructions.json
+TASKS = {
+    "simplify_summary": {
         "instruction": "පහත නීතිමය පෙළ සරල සිංහලෙන් සාරාංශ කරන්න. (අදාළ වන්නේ කාටද, මොනවා කරන්නද කියලා පැහැදිලි කරන්න.)",
-        "input": text,
-        "output": ""   # you will fill manually
-    }
-
-def make_extract_row(chunk_id, text):
-    return {
-        "id": chunk_id,
-        "task": "extract_obligations",
+        "output": "",   # you will fill manually
+    },
+    "extract_obligations": {
         "instruction": "පහත පෙළෙන් වගකීම්, කාලසීමා, සහ දඩ/දඬුවම් තිබේනම් JSON ලෙස වෙන් කර දෙන්න. නොමැති දේවල් null කරන්න.",
-        "input": text,
-        "output": "{\"obligations\": null, \"deadlines\": null, \"penalties\": null}"
-    }
-
-rows = []
-with IN_PATH.open("r", encoding="utf-8") as f:
-    for line in f:
-        r = json.loads(line)
-        text = r.get("text","")
-        if len(text) < 120:
-            continue
-        if is_table_like(text):
-            continue
-        rows.append(r)
-
-finetune = []
-for r in rows:
-    cid = r["chunk_id"]
-    txt = r["text"]
-    finetune.append(make_summary_row(cid, txt))
-    finetune.append(make_extract_row(cid, txt))
-
-out_path = OUT_DIR / "finetune.jsonl"
-with out_path.open("w", encoding="utf-8") as f:
-    for x in finetune:
-        f.write(json.dumps(x, ensure_ascii=False) + "\n")
-
-print("Saved:", out_path, "rows:", len(finetune))
+        "output": "{\"obligations\": null, \"deadlines\": null, \"penalties\": null}",
+    },
+}
+
+def main():
+    duplicates = load_duplicates(duplicates_path("acts"), IN_PATH) if DROP_NEAR_DUPLICATES else set()
+    # too short (< 120 chars) or table-like (many numbers/symbols): see chunk_quality.acts_drop_masks
+    index = build(IN_PATH, OUT_DIR, TASKS, acts_drop_masks, keywords=False, duplicates=duplicates, splits=SPLITS,
+                  workers=FINETUNE_WORKERS, window=FINETUNE_WINDOW)
+    print("Saved:", OUT_DIR / "index.json", "rows:", index["rows"])
+    for name, split in index["splits"].items():
+        print(f"  {name}: {split['documents']} documents, {split['rows']} rows, {len(split['shards'])} shards")
+
+    if PRETOKENIZE_WITH:
+        for split, meta in pretokenize(OUT_DIR, PRETOKENIZE_WITH).items():
+            print(f"Pre-tokenized {split}:", meta["examples"], "examples,", meta["tokens"], "tokens")
+
+if __name__ == "__main__":
+    main()
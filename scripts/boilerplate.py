@@ -0,0 +1,163 @@
+import os
+import re
+import time
+import hashlib
+from array import array
+from pathlib import Path
+
+from parallel import ordered_imap
+
+
+# Corpus-level boilerplate stripper (replaces drop_until_nth_newline once an index exists).
+#
+# A line is boilerplate when, after normalization (whitespace collapsed, digits -> #),
+# it occurs in at least MIN_DOC_FRACTION of all documents: mastheads, printer lines,
+# price and address footers. One streaming scan counts the document frequency of every
+# line hash with the Misra-Gries summary: at most MAX_COUNTERS counters live at once,
+# whatever the corpus size. Its counts never exceed the true ones, so no line is marked
+# by mistake; a line is guaranteed to be found once its document frequency exceeds the
+# threshold by (distinct lines in the corpus) / MAX_COUNTERS.
+# The result is a sorted array of 64-bit line hashes.
+#
+#   python boilerplate.py acts|gazettes      builds the script's BOILERPLATE_INDEX
+
+MIN_DOC_FRACTION = 0.1   # in at least 10% of the documents
+MIN_LINE_CHARS = 20      # shorter lines are too often wrapped sentence fragments
+MIN_LINE_WORDS = 4
+MAX_COUNTERS = 200_000   # Misra-Gries summary size (~20 MB)
+
+_DIGITS = re.compile(r"\d")
+_SPACES = re.compile(r"\s+")
+
+
+def line_key(line: str):
+    """64-bit hash of the normalized line, or None if the line is too short to judge."""
+    norm = _DIGITS.sub("#", _SPACES.sub(" ", line).strip())
+    if len(norm) < MIN_LINE_CHARS or norm.count(" ") + 1 < MIN_LINE_WORDS:
+        return None
+    return int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def split_lines(text: str):
+    # "\n" only, for counting and stripping alike: splitlines() also breaks at form feeds
+    # and other separators that strip_boilerplate has to keep inside its lines
+    return text.split("\n")
+
+
+def document_keys(text: str) -> set:
+    keys = {line_key(ln) for ln in split_lines(text)}
+    keys.discard(None)
+    return keys
+
+
+class MisraGries:
+    def __init__(self, k):
+        self.k = k
+        self.counts = {}
+        self.n = 0  # items seen
+
+    def add(self, key):
+        self.n += 1
+        counts = self.counts
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < self.k:
+            counts[key] = 1
+        else:
+            # the new key and every counter lose one; runs at most n / k times
+            self.counts = {h: c - 1 for h, c in counts.items() if c > 1}
+
+
+# Worker side: the corpus' normalize_text, set once per process
+_normalize = None
+
+
+def _init_worker(normalize):
+    global _normalize
+    _normalize = normalize
+
+
+def _file_keys(path):
+    return document_keys(_normalize(Path(path).read_text(encoding="utf-8", errors="replace")))
+
+
+def build_index(files, normalize, path, workers=None):
+    """Scan the .txt files once and write the boilerplate index. Returns the number of lines."""
+    summary = MisraGries(MAX_COUNTERS)
+    results = ordered_imap(_file_keys, map(str, files), workers=workers,
+                           initializer=_init_worker, initargs=(normalize,))
+    for keys in results:
+        for key in keys:
+            summary.add(key)
+
+    min_docs = max(2, int(MIN_DOC_FRACTION * len(files)))
+    index = array("Q", sorted(h for h, c in summary.counts.items() if c >= min_docs))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        index.tofile(f)
+    os.replace(tmp, path)
+    return len(index)
+
+
+_indexes = {}
+
+
+def load_index(path):
+    """frozenset of boilerplate line hashes, or None if no index was built."""
+    if path not in _indexes:
+        if not os.path.exists(path):
+            return None
+        index = array("Q")
+        with open(path, "rb") as f:
+            index.frombytes(f.read())
+        _indexes[path] = frozenset(index)
+    return _indexes[path]
+
+
+def index_fingerprint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def strip_boilerplate(text: str, index, profiler=None) -> str:
+    t0 = time.perf_counter()
+    kept, hits, chars = [], 0, 0
+    for ln in split_lines(text):
+        if line_key(ln) in index:
+            hits += 1
+            chars += len(ln)
+        else:
+            kept.append(ln)
+    if profiler is not None:
+        profiler.add("boilerplate", "index", hits, chars, time.perf_counter() - t0)
+    return "\n".join(kept)
+
+
+def main():
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "acts"
+    if target == "acts":
+        import preprocess_acts as pre
+    elif target == "gazettes":
+        import preprocess_extraordinary_gazettes as pre
+    else:
+        print("Usage: python boilerplate.py [acts|gazettes]")
+        sys.exit(1)
+
+    files = sorted(Path(pre.ACTS_OUTPUT_DIR).glob("*.txt"))
+    if not files:
+        print(f"No .txt files found in: {Path(pre.ACTS_OUTPUT_DIR).resolve()}")
+        return
+
+    path = pre.BOILERPLATE_INDEX
+    n = build_index(files, pre.normalize_text, path, workers=pre.PREPROCESS_WORKERS)
+    print(f"✔ {n} boilerplate lines from {len(files)} documents -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+
+# Batch quality features for the Build_*_Finetune_jsonl.py chunk filters.
+#
+# A batch of chunks is joined into one string and turned into an array of code points;
+# every per-character and per-line count comes from table lookups and bincounts over
+# that array, and the keyword regexes run once over the whole (whitespace-collapsed)
+# batch (skipped with keywords=False: the acts filters do not use those counts).
+# The filters are then threshold comparisons on the feature columns.
+#
+# row_features() is the same matrix row computed the plain way, one chunk at a time,
+# with exactly the checks the build scripts used to run per row:
+#   lines          str.splitlines() + strip(), empty lines dropped
+#   numeric line   re.fullmatch(r"[\d\W_]+", line)
+#   short line     len(line) <= 3 or PAGE_NO_PAT
+#   collapsed text re.sub(r"\s+", " ", text).strip(), for the keyword and sentence counts
+#
+#   python chunk_quality.py acts|gazettes     checks batch_features() against row_features() and times both
+
+FEATURES = (
+    "chars",            # len(text)
+    "stripped_chars",   # len(text.strip())
+    "collapsed_chars",  # len(re.sub(r"\s+", " ", text).strip())
+    "sinhala_ratio",    # share of the non-space characters in U+0D80..U+0DFF
+    "latin_ratio",      # ... in A-Z, a-z
+    "digit_ratio",      # ... that are \d
+    "lines",            # non-empty lines
+    "numeric_lines",
+    "short_lines",
+    "meta_hits",        # GAZETTE_META_PAT matches in the collapsed text
+    "header_hits",      # HEADER_FOOTER_PAT matches in the collapsed text
+    "sentence_marks",   # SENTENCE_MARK_PAT matches in the collapsed text
+    "replacement_chars",
+)
+COLUMN = {name: i for i, name in enumerate(FEATURES)}
+
+BATCH_SIZE = 4096
+
+# Gazette front-matter / publication meta noise (common in OCR/text extracts)
+GAZETTE_META_PAT = re.compile(
+    r"(ගැසට්|අතිරේක|අති විශේෂ|extraordinary|gazette|පත්‍රයේ|මුද්‍රණය|මුද්‍රණ දෙපාර්තමේන්තුව|"
+    r"government printer|printed|ප්‍රකාශයට පත්|පළ කරන ලදී|අංක\s*\d+\/\d+|No\.\s*\d+\/\d+)",
+    re.IGNORECASE
+)
+
+# Very common footer/header lines in gazettes
+HEADER_FOOTER_PAT = re.compile(
+    r"(ශ්‍රී ලංකා ප්‍රජාතාන්ත්‍රික සමාජවාදී ජනරජය|democratic socialist republic|"
+    r"gazz?ette of the democratic socialist republic|the gazette of sri lanka)",
+    re.IGNORECASE
+)
+
+# Detect page-number-ish lines
+PAGE_NO_PAT = re.compile(r"^\s*(\d+|page\s*\d+)\s*$", re.IGNORECASE)
+
+# Detect mostly-symbol / mostly-numeric lines
+NUMSYM_LINE_PAT = re.compile(r"^[\d\W_]+$")
+
+# sentence markers in Sinhala/English
+SENTENCE_MARK_PAT = re.compile(r"[။\.]\s")
+
+# joins the collapsed batch; noncharacters, so at least one is missing from any real text
+_SEPARATORS = ("\x00", "\ufdd0", "\ufdd1", "\ufdd2")
+
+
+def row_features(text: str) -> list:
+    """One row of the feature matrix, the plain per-chunk way."""
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    t = re.sub(r"\s+", " ", text).strip()
+    chars = [c for c in text if not c.isspace()]
+    denom = max(len(chars), 1)
+    return [
+        len(text),
+        len(text.strip()),
+        len(t),
+        sum(1 for c in chars if "\u0d80" <= c <= "\u0dff") / denom,
+        sum(1 for c in chars if "A" <= c <= "Z" or "a" <= c <= "z") / denom,
+        sum(1 for c in chars if c.isdecimal()) / denom,
+        len(lines),
+        sum(1 for ln in lines if NUMSYM_LINE_PAT.fullmatch(ln) is not None),
+        sum(1 for ln in lines if len(ln) <= 3 or PAGE_NO_PAT.fullmatch(ln)),
+        len(GAZETTE_META_PAT.findall(t)),
+        len(HEADER_FOOTER_PAT.findall(t)),
+        len(SENTENCE_MARK_PAT.findall(t)),
+        text.count("\ufffd"),
+    ]
+
+
+@lru_cache(maxsize=None)
+def _char_tables():
+    """Per code point: whitespace (str.isspace, = re \\s), line break (str.splitlines), \\d, and \\w minus \\d and _."""
+    n = 0x110000
+    space = np.zeros(n, dtype=bool)
+    brk = np.zeros(n, dtype=bool)
+    digit = np.zeros(n, dtype=bool)
+    letter = np.zeros(n, dtype=bool)
+    for cp in range(n):
+        c = chr(cp)
+        if c.isspace():
+            space[cp] = True
+            brk[cp] = len(f"a{c}a".splitlines()) == 2
+        elif c.isdecimal():
+            digit[cp] = True
+        elif c.isalnum():
+            letter[cp] = True
+    return space, brk, digit, letter
+
+
+def _first_last(groups, positions, n):
+    """First and last position per group for sorted groups; -1 where a group is empty."""
+    lo = np.searchsorted(groups, np.arange(n), "left")
+    hi = np.searchsorted(groups, np.arange(n), "right")
+    present = hi > lo
+    first = np.where(present, positions[np.minimum(lo, len(positions) - 1)], -1) if len(positions) else np.full(n, -1)
+    last = np.where(present, positions[np.maximum(hi - 1, 0)], -1) if len(positions) else np.full(n, -1)
+    return first, last
+
+
+def batch_features(texts, keywords=True) -> np.ndarray:
+    """
+    (len(texts), len(FEATURES)) matrix, equal to [row_features(t) for t in texts].
+    keywords=False skips the regex pass: meta_hits, header_hits and sentence_marks stay 0.
+    """
+    n = len(texts)
+    out = np.zeros((n, len(FEATURES)))
+    if not n:
+        return out
+    space_t, brk_t, digit_t, letter_t = _char_tables()
+
+    # one code point array for the batch; the "\n" between chunks is a space and a line break
+    joined = "\n".join(texts)
+    cp = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=n)
+    pos_chunk = np.repeat(np.arange(n), lengths + 1)[:len(cp)]
+
+    space = space_t[cp]
+    nonspace = np.flatnonzero(~space)
+    out[:, COLUMN["chars"]] = lengths
+    if not len(nonspace):
+        return out
+    ns_chunk = pos_chunk[nonspace]
+    ns_count = np.bincount(ns_chunk, minlength=n)
+    first, last = _first_last(ns_chunk, nonspace, n)
+
+    out[:, COLUMN["stripped_chars"]] = np.where(ns_count > 0, last - first + 1, 0)
+
+    # collapsed length: non-space characters + one per whitespace run inside the stripped span
+    run_start = np.flatnonzero(space & ~np.concatenate(([False], space[:-1])))
+    rs_chunk = pos_chunk[run_start]
+    inside = (run_start > first[rs_chunk]) & (run_start < last[rs_chunk])
+    out[:, COLUMN["collapsed_chars"]] = ns_count + np.bincount(rs_chunk[inside], minlength=n)
+
+    ns_cp = cp[nonspace]
+    denom = np.maximum(ns_count, 1)
+    sinhala = (ns_cp >= 0x0D80) & (ns_cp <= 0x0DFF)
+    latin = ((ns_cp >= 0x41) & (ns_cp <= 0x5A)) | ((ns_cp >= 0x61) & (ns_cp <= 0x7A))
+    is_digit = digit_t[ns_cp]
+    out[:, COLUMN["sinhala_ratio"]] = np.bincount(ns_chunk[sinhala], minlength=n) / denom
+    out[:, COLUMN["latin_ratio"]] = np.bincount(ns_chunk[latin], minlength=n) / denom
+    out[:, COLUMN["digit_ratio"]] = np.bincount(ns_chunk[is_digit], minlength=n) / denom
+    out[:, COLUMN["replacement_chars"]] = np.bincount(ns_chunk[ns_cp == 0xFFFD], minlength=n)
+
+    # lines: ids from the running count of line breaks; only lines with a non-space character count
+    ns_line = np.cumsum(brk_t[cp], dtype=np.int32)[nonspace]
+    line_first = np.flatnonzero(np.concatenate(([True], ns_line[1:] != ns_line[:-1])))
+    line_last = np.concatenate((line_first[1:], [len(ns_line)])) - 1
+    line_len = nonspace[line_last] - nonspace[line_first] + 1
+    line_chunk = ns_chunk[line_first]
+
+    numeric = np.add.reduceat(letter_t[ns_cp].astype(np.int32), line_first) == 0
+    short = (line_len <= 3) | (np.add.reduceat(is_digit.astype(np.int32), line_first) == line_len)
+    # "page 12" is the only PAGE_NO_PAT form the digit count cannot see
+    for j in np.flatnonzero(~short & np.isin(ns_cp[line_first], (ord("p"), ord("P")))):
+        a = nonspace[line_first[j]]
+        short[j] = PAGE_NO_PAT.fullmatch(joined[a:a + line_len[j]]) is not None
+    out[:, COLUMN["lines"]] = np.bincount(line_chunk, minlength=n)
+    out[:, COLUMN["numeric_lines"]] = np.bincount(line_chunk[numeric], minlength=n)
+    out[:, COLUMN["short_lines"]] = np.bincount(line_chunk[short], minlength=n)
+
+    if not keywords:
+        return out
+
+    # keyword and sentence counts: one regex pass over the collapsed batch
+    sep = next(s for s in _SEPARATORS if s not in joined)
+    collapsed = re.sub(r"\s+", " ", sep.join(texts))
+    collapsed = collapsed.replace(f" {sep}", sep).replace(f"{sep} ", sep).strip()
+    bounds = np.flatnonzero(np.frombuffer(collapsed.encode("utf-32-le"), dtype=np.uint32) == ord(sep))
+    for name, pat in (("meta_hits", GAZETTE_META_PAT), ("header_hits", HEADER_FOOTER_PAT),
+                      ("sentence_marks", SENTENCE_MARK_PAT)):
+        hits = np.fromiter((m.start() for m in pat.finditer(collapsed)), dtype=np.int64)
+        out[:, COLUMN[name]] = np.bincount(np.searchsorted(bounds, hits), minlength=n)
+    return out
+
+
+def features(texts, keywords=True, batch_size=BATCH_SIZE) -> np.ndarray:
+    parts = [batch_features(texts[i:i + batch_size], keywords) for i in range(0, len(texts), batch_size)]
+    return np.vstack(parts) if parts else np.zeros((0, len(FEATURES)))
+
+
+def col(F, name):
+    return F[:, COLUMN[name]]
+
+
+# The build scripts' filters as masks, in the order the checks used to run:
+# a chunk is counted under the first reason that matches.
+
+def gazette_drop_masks(F) -> dict:
+    lines = col(F, "lines")
+    per_line = np.maximum(lines, 1)
+    collapsed = col(F, "collapsed_chars")
+    meta = col(F, "meta_hits")
+    return {
+        "too_short": col(F, "stripped_chars") < 120,
+        # three replacement characters counted per "�" in the original check
+        "too_noisy": (3 * col(F, "replacement_chars") >= 3) & (col(F, "stripped_chars") < 400),
+        "table_like": (lines >= 5) & ((col(F, "numeric_lines") / per_line >= 0.45)
+                                      | (col(F, "short_lines") / per_line >= 0.35)),
+        "pure_metadata": (
+            (collapsed == 0)
+            | ((collapsed < 160) & (meta > 0))
+            | ((meta + col(F, "header_hits") >= 2) & (col(F, "sentence_marks") <= 1) & (collapsed < 350))
+        ),
+    }
+
+
+def acts_drop_masks(F) -> dict:
+    lines = col(F, "lines")
+    return {
+        "too_short": col(F, "chars") < 120,
+        "table_like": (lines >= 4) & (col(F, "numeric_lines") / np.maximum(lines, 1) >= 0.6),
+    }
+
+
+def first_reason(masks, n) -> np.ndarray:
+    """Index into list(masks) of the first matching reason per chunk, -1 to keep it."""
+    reason = np.full(n, -1)
+    for i, mask in reversed(list(enumerate(masks.values()))):
+        reason[mask] = i
+    return reason
+
+
+def drop_counts(masks, n) -> dict:
+    reason = first_reason(masks, n)
+    return {name: int(np.count_nonzero(reason == i)) for i, name in enumerate(masks)}
+
+
+def main():
+    import sys
+    import json
+    import time
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "acts"
+    paths = {"acts": "../Dataset_Acts_Stage_1/chunks.jsonl",
+             "gazettes": "../Dataset_Gazettes_Stage_1/gazette_chunks.jsonl"}
+    if target not in paths:
+        print("Usage: python chunk_quality.py [acts|gazettes]")
+        sys.exit(1)
+    with open(paths[target], encoding="utf-8") as f:
+        texts = [json.loads(line).get("text", "") or "" for line in f]
+
+    _char_tables()
+    t0 = time.perf_counter()
+    rows = np.array([row_features(t) for t in texts]).reshape(len(texts), len(FEATURES))
+    t1 = time.perf_counter()
+    F = features(texts)
+    t2 = time.perf_counter()
+
+    bad = [name for i, name in enumerate(FEATURES) if not np.allclose(rows[:, i], F[:, i])]
+    if bad:
+        raise SystemExit(f"❌ batch features differ from row_features: {bad}")
+    masks = acts_drop_masks(F) if target == "acts" else gazette_drop_masks(F)
+    print(f"✔ {len(texts)} chunks, identical features")
+    print(f"   per row {t1 - t0:.2f}s   batch {t2 - t1:.2f}s   drops {drop_counts(masks, len(texts))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import re
+import time
+from pathlib import Path
+
+
+# Applies an ordered list of (old, new) str.replace rules with as few scans as possible.
+#
+# Rules run in order, and a later rule sees the output of the earlier ones
+# ("අනි විශෙෂ" -> "අති විශෙෂ" -> "අති විශේෂ" relies on that).
+# Rules that cannot see each other's matches or output commute, so each rule is
+# moved to the earliest stage its dependencies allow. Inside a stage, rules
+# sharing a first character become one regex scan (trie-built alternation +
+# dict lookup); the shared literal prefix keeps the scan at str.find speed.
+# The result is identical to running the rules one by one.
+# CompiledReplacer.traced() also reports which rules fired, from the same scans:
+# the same list apply_traced() returns, without running the rules one by one.
+
+
+def apply_sequential(text: str, rules) -> str:
+    """Reference semantics: one str.replace pass per rule."""
+    for a, b in rules:
+        text = text.replace(a, b)
+    return text
+
+
+def apply_traced(text: str, rules):
+    """
+    Sequential application that also returns the rules that changed the text, in order.
+    Rules that did not fire were no-ops, so the result depends only on this list.
+    """
+    fired = []
+    for a, b in rules:
+        if a != b and a in text:
+            text = text.replace(a, b)
+            fired.append((a, b))
+    return text, fired
+
+
+def overlaps(x: str, y: str) -> bool:
+    """True if an occurrence of x and an occurrence of y can share a character."""
+    if x in y or y in x:
+        return True
+    for k in range(1, min(len(x), len(y))):
+        if x.endswith(y[:k]) or y.endswith(x[:k]):
+            return True
+    return False
+
+
+def _conflicts(earlier, later) -> bool:
+    a1, b1 = earlier
+    a2, b2 = later
+    # the two patterns could compete for the same characters
+    if overlaps(a1, a2):
+        return True
+    # the earlier rule's output could create a new match for the later one
+    if b1 == "":
+        return len(a2) > 1  # deleting text joins its neighbours
+    return overlaps(a2, b1)
+
+
+def plan_stages(rules):
+    """Group rules into stages; stages run in order, rules within a stage are independent."""
+    stages, level = [], []
+    for j, rule in enumerate(rules):
+        s = 0
+        for i in range(j):
+            if _conflicts(rules[i], rule) or _conflicts(rule, rules[i]):
+                s = max(s, level[i] + 1)
+        level.append(s)
+        if s == len(stages):
+            stages.append([])
+        stages[s].append(rule)
+    return stages
+
+
+def _trie_regex(words) -> str:
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = None
+
+    def build(node):
+        end = "" in node
+        children = [(ch, sub) for ch, sub in sorted(node.items()) if ch]
+        if not children:
+            return ""
+        leaves = [ch for ch, sub in children if list(sub) == [""]]
+        alts = [re.escape(ch) + build(sub) for ch, sub in children if list(sub) != [""]]
+        if len(leaves) == 1:
+            alts.append(re.escape(leaves[0]))
+        elif leaves:
+            alts.append("[" + "".join(re.escape(ch) for ch in leaves) + "]")
+        out = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if end:
+            out = "(?:" + out + ")?"
+        return out
+
+    return build(trie)
+
+
+class CompiledReplacer:
+    def __init__(self, rules):
+        rules = [tuple(r) for r in rules]
+        self.source_rules = rules
+        if any(not a for a, _ in rules):
+            raise ValueError("empty search string in replacement rules")
+        # identity rules never change the text
+        self.rules = [(a, b) for a, b in rules if a != b]
+        # each scan keeps the position of its rule(s) in self.rules for traced();
+        # a repeated rule conflicts with itself, so its copies land in different stages
+        index = {}
+        for i, rule in enumerate(self.rules):
+            index.setdefault(rule, []).append(i)
+        self.stages, self.positions = [], []
+        for stage in plan_stages(self.rules):
+            by_first = {}
+            for rule in stage:
+                by_first.setdefault(rule[0][0], []).append((rule, index[rule].pop(0)))
+            for group in by_first.values():
+                if len(group) == 1:
+                    (rule, i), = group
+                    self.stages.append(rule)
+                    self.positions.append(i)
+                else:
+                    lookup = dict(rule for rule, _ in group)
+                    pattern = re.compile(_trie_regex(lookup))
+                    self.stages.append((pattern, lookup))
+                    self.positions.append({rule[0]: i for rule, i in group})
+
+    def __call__(self, text: str) -> str:
+        for a, b in self.stages:
+            if isinstance(a, str):
+                text = text.replace(a, b)
+            else:
+                text = a.sub(lambda m, lookup=b: lookup[m.group()], text)
+        return text
+
+    def traced(self, text: str):
+        """(result, rules that changed the text in rule order), the same as apply_traced()."""
+        fired = []
+        for (a, b), pos in zip(self.stages, self.positions):
+            if isinstance(a, str):
+                if a in text:
+                    text = text.replace(a, b)
+                    fired.append(pos)
+            else:
+                hits = set()
+
+                def repl(m, lookup=b):
+                    hits.add(m.group())
+                    return lookup[m.group()]
+
+                text = a.sub(repl, text)
+                fired.extend(pos[k] for k in hits)
+        return text, [self.rules[i] for i in sorted(fired)]
+
+
+# Equality proof + benchmark on the acts corpus
+
+def _corpus(in_dir):
+    from preprocess_acts import normalize_text, drop_until_nth_newline
+
+    texts = []
+    for fp in sorted(Path(in_dir).glob("*.txt")):
+        raw = fp.read_text(encoding="utf-8", errors="replace")
+        texts.append((fp.name, drop_until_nth_newline(normalize_text(raw), n=4)))
+    return texts
+
+
+def _bench(fn, texts, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, text in texts:
+            fn(text)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    import preprocess_acts
+    import preprocess_extraordinary_gazettes
+
+    texts = _corpus(preprocess_acts.ACTS_OUTPUT_DIR)
+    mb = sum(len(t.encode("utf-8")) for _, t in texts) / 1024 ** 2
+    print(f"Corpus: {len(texts)} files, {mb:.1f} MB")
+
+    for name, rules in [
+        ("acts", preprocess_acts.REPLACEMENTS),
+        ("gazettes", preprocess_extraordinary_gazettes.REPLACEMENTS),
+    ]:
+        replacer = CompiledReplacer(rules)
+        bad = [fn for fn, t in texts if replacer(t) != apply_sequential(t, rules)]
+        if bad:
+            raise SystemExit(f"❌ {name}: {len(bad)} files differ, e.g. {bad[:3]}")
+        bad = [fn for fn, t in texts if replacer.traced(t) != apply_traced(t, rules)]
+        if bad:
+            raise SystemExit(f"❌ {name}: traced rules differ on {len(bad)} files, e.g. {bad[:3]}")
+
+        seq = _bench(lambda t: apply_sequential(t, rules), texts)
+        comp = _bench(replacer, texts)
+        traced = _bench(replacer.traced, texts)
+        print(f"✔ {name}: {len(rules)} rules -> {len(replacer.stages)} scans, identical on all files")
+        print(f"   sequential {seq:.2f}s   compiled {comp:.2f}s   ({seq / comp:.2f}x)   compiled + traced {traced:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,118 @@
 import os
 import json
 import re
+import time
+import random
+import hashlib
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'pdfs')
 PDF_PATTERN = re.compile(r"https?://[^\s\"']+\.pdf", re.IGNORECASE)
 
+# Concurrent downloads (1 = one at a time)
+DOWNLOAD_WORKERS = 8
+CHUNK_SIZE = 256 * 1024
+MAX_RETRIES = 5
+# Exponential backoff between attempts: random wait in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**(attempt-1))]
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Records every URL's ETag / Last-Modified / size / sha256 and every source JSON's
+# mtime + size, so re-runs send conditional GETs and only re-parse changed sources
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'manifest.json')
+# Rewrite the manifest every N recorded URLs, so an interrupted run keeps its progress
+MANIFEST_SAVE_EVERY = 50
+
+
+class DownloadManifest:
+    """
+    {"sources": {json_rel_path: {"mtime_ns", "size", "links"}},
+     "urls": {url: {"file", "etag", "last_modified", "size", "sha256", "duplicate_of"}}}
+    Shared by the download threads, so every access goes through the lock.
+    Saved to disk after every save_every record() calls and by save().
+    Every stored file belongs to one URL (by_file), so two URLs ending in the same
+    name never overwrite each other's PDF.
+    """
+
+    def __init__(self, path, save_every=MANIFEST_SAVE_EVERY):
+        self.path = path
+        self.lock = threading.Lock()
+        self.save_every = save_every
+        self.unsaved = 0
+        data = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        self.sources = data.get('sources', {})
+        self.urls = data.get('urls', {})
+        self.by_sha = {e['sha256']: url for url, e in self.urls.items() if e.get('sha256') and not e.get('duplicate_of')}
+        self.by_file = {e['file']: url for url, e in self.urls.items() if e.get('file') and not e.get('duplicate_of')}
+
+    def entry(self, url):
+        with self.lock:
+            return dict(self.urls.get(url, {}))
+
+    def record(self, url, **fields):
+        with self.lock:
+            entry = self.urls.setdefault(url, {})
+            old_sha = entry.get('sha256')
+            entry.update(fields)
+            if old_sha and self.by_sha.get(old_sha) == url and (old_sha != entry.get('sha256') or entry.get('duplicate_of')):
+                # the URL no longer holds that content, so a later copy of it must not point here
+                del self.by_sha[old_sha]
+            if entry.get('sha256') and not entry.get('duplicate_of'):
+                self.by_sha.setdefault(entry['sha256'], url)
+            self.unsaved += 1
+            if self.save_every and self.unsaved >= self.save_every:
+                self._save()
+
+    def assign_file(self, url, filename):
+        """
+        The file name url is stored under: the one it already has, else filename,
+        else filename with a hash of the URL if another URL owns that name.
+        """
+        with self.lock:
+            entry = self.urls.get(url, {})
+            if entry.get('file') and not entry.get('duplicate_of'):
+                return entry['file']
+            owner = self.by_file.get(filename)
+            if owner and owner != url:
+                stem, ext = os.path.splitext(filename)
+                filename = f'{stem}.{url_key(url)}{ext}'
+            self.by_file[filename] = url
+            return filename
+
+    def claim(self, url, sha256, output_dir):
+        """Return the URL already holding a file with this content, or register url as its owner."""
+        with self.lock:
+            owner = self.by_sha.get(sha256)
+            if owner and owner != url:
+                owner_file = self.urls.get(owner, {}).get('file')
+                if owner_file and os.path.exists(os.path.join(output_dir, owner_file)):
+                    # url is stored as a duplicate, so it gives up its own file name
+                    for name in [name for name, u in self.by_file.items() if u == url]:
+                        del self.by_file[name]
+                    return owner
+            self.by_sha[sha256] = url
+            return None
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        # caller holds the lock
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'sources': self.sources, 'urls': self.urls}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self.unsaved = 0
+
 
 def find_json_files(root_dir):
     for root, _, files in os.walk(root_dir):
@@ -31,38 +136,204 @@ def extract_pdf_links_from_json(json_path):
         print(f'Error reading {json_path}: {e}')
     return links
 
-def download_pdf(url, output_dir):
+def scan_sources(root_dir, manifest):
+    """Collect PDF links, re-parsing only the JSON files whose mtime or size changed."""
+    all_links = set()
+    sources = {}
+    parsed = 0
+    for json_file in find_json_files(root_dir):
+        key = os.path.relpath(json_file, root_dir)
+        st = os.stat(json_file)
+        cached = manifest.sources.get(key)
+        if cached and cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+            links = cached['links']
+        else:
+            links = sorted(extract_pdf_links_from_json(json_file))
+            parsed += 1
+        sources[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'links': links}
+        all_links.update(links)
+    manifest.sources = sources
+    print(f'Scanned {len(sources)} JSON files ({parsed} new or changed, {len(sources) - parsed} unchanged).')
+    return all_links
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def make_session(pool_size):
+    # one keep-alive pool per host, big enough for every worker thread
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def backoff_delay(attempt):
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+def expected_size(r, offset):
+    # total size of the file, from Content-Range on a resumed (206) response
+    content_range = r.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    length = r.headers.get('Content-Length')
+    return offset + int(length) if length is not None else None
+
+def url_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+def part_paths(url, output_dir, filename):
+    # keyed by the URL, so two URLs ending in the same file name never share a .part file
+    part_path = os.path.join(output_dir, f'{filename}.{url_key(url)}.part')
+    return part_path, part_path + '.json'
+
+def load_part_validators(meta_path):
+    """ETag / Last-Modified of the response the .part file was started from."""
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_part_validators(meta_path, headers):
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}, f)
+
+def if_range_header(validators):
+    # If-Range takes a strong ETag or a date; without one a resume could splice two versions
+    etag = validators.get('etag')
+    if etag and not etag.startswith('W/'):
+        return {'If-Range': etag}
+    if validators.get('last_modified'):
+        return {'If-Range': validators['last_modified']}
+    return None
+
+def remove_part(part_path, meta_path):
+    for path in (part_path, meta_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+def unsatisfied_range_size(r):
+    # a 416 response states the full size as Content-Range: bytes */N
+    total = r.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+    return int(total) if total.isdigit() else None
+
+def finish_download(url, filename, output_dir, part_path, validators, manifest):
+    """Move a complete .part into place, or drop it if the same PDF is already stored under another URL."""
+    out_path = os.path.join(output_dir, filename)
+    size = os.path.getsize(part_path)
+    if manifest is None:
+        os.replace(part_path, out_path)
+        return
+    sha256 = file_sha256(part_path)
+    owner = manifest.claim(url, sha256, output_dir)
+    if owner:
+        os.remove(part_path)
+        owner_file = manifest.entry(owner)['file']
+        manifest.record(url, file=owner_file, size=size, sha256=sha256, duplicate_of=owner, **validators)
+        print(f'Duplicate: {filename} is identical to {owner_file}, not stored twice.')
+        return
+    os.replace(part_path, out_path)
+    manifest.record(url, file=filename, size=size, sha256=sha256, duplicate_of=None, **validators)
+
+def download_pdf(url, output_dir, session=None, manifest=None):
+    """
+    Stream url into <name>.pdf.<url hash>.part and rename it only once it is complete,
+    so a crash never leaves a truncated file that looks finished.
+    An existing .part file is resumed with an HTTP Range request guarded by If-Range,
+    so a PDF that changed on the server is downloaded again from the start.
+    With a manifest, files we already have are re-checked with a conditional GET, and a
+    URL whose file name is taken by another URL is stored as <name>.<url hash>.pdf.
+    """
+    session = session or requests
     parsed = urlparse(url)
     filename = os.path.basename(parsed.path)
+    if manifest is not None:
+        filename = manifest.assign_file(url, filename)
     out_path = os.path.join(output_dir, filename)
-    if os.path.exists(out_path):
-        print(f'Skipping {filename}, already exists.')
-        return True
-    max_retries = 3
-    for attempt in range(1, max_retries + 1):
+    part_path, meta_path = part_paths(url, output_dir, filename)
+    entry = manifest.entry(url) if manifest is not None else {}
+    have_file = os.path.exists(out_path) or (
+        entry.get('duplicate_of') and os.path.exists(os.path.join(output_dir, entry['file']))
+    )
+    conditional = {}
+    if have_file:
+        if entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+        if not conditional:
+            # downloaded before there was a manifest (or no validators): keep the old exists-check
+            if manifest is not None and not entry.get('sha256') and os.path.exists(out_path):
+                manifest.record(url, file=filename, size=os.path.getsize(out_path), sha256=file_sha256(out_path))
+            print(f'Skipping {filename}, already exists.')
+            return True
+    for attempt in range(1, MAX_RETRIES + 1):
         try:
-            print(f'Downloading {url}... (Attempt {attempt})')
-            r = requests.get(url, timeout=30)
-            r.raise_for_status()
-            with open(out_path, 'wb') as f:
-                f.write(r.content)
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            validators = load_part_validators(meta_path) if offset else {}
+            if_range = if_range_header(validators) if offset else None
+            if offset and if_range is None:
+                remove_part(part_path, meta_path)  # nothing to tell whether the PDF changed: start over
+                offset = 0
+            headers = {'Range': f'bytes={offset}-', **if_range} if offset else conditional
+            print(f'Downloading {url}... (Attempt {attempt}' + (f', resuming at {offset} bytes)' if offset else ')'))
+            with session.get(url, headers=headers, stream=True, timeout=30) as r:
+                if r.status_code == 304:
+                    print(f'Skipping {filename}, not modified.')
+                    return True
+                if offset and r.status_code == 416:
+                    # nothing left to fetch only if the .part file has the full size (Content-Range: */N)
+                    if unsatisfied_range_size(r) == offset:
+                        finish_download(url, filename, output_dir, part_path, validators, manifest)
+                        remove_part(part_path, meta_path)
+                        return True
+                    remove_part(part_path, meta_path)
+                    raise IOError(f'.part file of {offset} bytes does not match {r.headers.get("Content-Range")!r}')
+                r.raise_for_status()
+                if offset and r.status_code != 206:
+                    offset = 0  # changed on the server (If-Range) or Range ignored: start over
+                if not offset:
+                    validators = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+                    save_part_validators(meta_path, r.headers)
+                total = expected_size(r, offset)
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                raise IOError(f'incomplete download: {size} of {total} bytes')
+            finish_download(url, filename, output_dir, part_path, validators, manifest)
+            remove_part(part_path, meta_path)
             return True
         except Exception as e:
             print(f'Failed to download {url} (Attempt {attempt}): {e}')
-            if attempt == max_retries:
-                print(f'Giving up on {url} after {max_retries} attempts.')
+            if attempt == MAX_RETRIES:
+                print(f'Giving up on {url} after {MAX_RETRIES} attempts.')
                 return False
+            time.sleep(backoff_delay(attempt))
     return False
 
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    all_links = set()
-    for json_file in find_json_files(DATA_DIR):
-        links = extract_pdf_links_from_json(json_file)
-        all_links.update(links)
+    manifest = DownloadManifest(MANIFEST_PATH)
+    all_links = scan_sources(DATA_DIR, manifest)
     print(f'Found {len(all_links)} unique PDF links.')
-    for url in sorted(all_links):
-        download_pdf(url, OUTPUT_DIR)
+    session = make_session(DOWNLOAD_WORKERS)
+    urls = sorted(all_links)
+    try:
+        if DOWNLOAD_WORKERS > 1:
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as ex:
+                results = list(ex.map(lambda url: download_pdf(url, OUTPUT_DIR, session, manifest), urls))
+        else:
+            results = [download_pdf(url, OUTPUT_DIR, session, manifest) for url in urls]
+    finally:
+        manifest.save()
+    duplicates = sum(1 for e in manifest.urls.values() if e.get('duplicate_of'))
+    print(f'Done: {sum(results)} ok, {len(results) - sum(results)} failed, {duplicates} duplicate URLs.')
 
 if __name__ == '__main__':
     main()
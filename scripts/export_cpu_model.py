@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+
+import torch
+from accelerate import init_empty_weights
+from peft import PeftModel
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+
+from prompt_template import format_prompt
+
+
+# CPU inference export of the fine-tuned model (Model_finetune/FYP_Model_finetune.ipynb).
+#
+# The notebook loads the fp32 base model and wraps the LoRA adapter with
+# PeftModel.from_pretrained in every session, so every Linear runs the adapter's two
+# extra matmuls. The export does that once:
+#   1. base + adapter, merge_and_unload(): W <- W + B @ A * scale, plain nn.Linear again
+#   2. torch.ao.quantization.quantize_dynamic(nn.Linear -> int8 weights, activations
+#      quantized on the fly), the usual CPU recipe for transformer decoders
+#   3. EXPORT_DIR: config.json + tokenizer + model_int8.pt (the quantized state_dict) + export.json
+# load_exported(EXPORT_DIR) rebuilds the model from config.json without the base
+# checkpoint, peft or the adapter, and without an fp32 copy: the parameters are created
+# on the meta device (init_empty_weights), every nn.Linear is swapped for an empty int8
+# dynamic Linear, and load_state_dict(assign=True) puts the saved tensors in place.
+#
+# The merged fp32 logits are checked against the unmerged model before quantizing,
+# and the int8 logits are compared with both; export.json records the differences.
+#
+# The benchmark runs each variant in a fresh subprocess, so load time and peak RSS are
+# not skewed by the other one: load seconds, greedy decode tokens/s for BENCH_NEW_TOKENS
+# tokens, peak RSS (resource.ru_maxrss, psutil on Windows), and how many generated tokens
+# match the unmerged fp32 model.
+#
+#   python export_cpu_model.py export [base] [adapter] [export_dir]
+#   python export_cpu_model.py bench  [base] [adapter] [export_dir]
+#   python export_cpu_model.py tiny       # both, on a tiny random Qwen2 stand-in and a random LoRA
+
+BASE_MODEL = "Qwen/Qwen2.5-1.5B-Instruct"
+ADAPTER_PATH = "../Model_finetune/FYP_models"  # folder containing adapter_model.safetensors
+EXPORT_DIR = "../Model_finetune/FYP_models_cpu_int8"
+WEIGHTS_NAME = "model_int8.pt"
+
+BENCH_NEW_TOKENS = 64
+BENCH_DOC = "මෙම පනත 2001 අංක 10 දරන පනත ලෙස හඳුන්වනු ලැබේ."
+BENCH_THREADS = None  # torch.set_num_threads in the benchmark; None = torch default
+
+
+def load_tokenizer(base, adapter):
+    """The adapter folder's tokenizer when it has one (as in the notebook), else the base model's."""
+    try:
+        return AutoTokenizer.from_pretrained(adapter, trust_remote_code=True)
+    except (OSError, ValueError):
+        return AutoTokenizer.from_pretrained(base, trust_remote_code=True)
+
+
+def load_unmerged(base, adapter):
+    """The notebook's CPU path: fp32 base with the LoRA adapter wrapped around it."""
+    model = AutoModelForCausalLM.from_pretrained(base, torch_dtype=torch.float32, trust_remote_code=True)
+    return PeftModel.from_pretrained(model, adapter).eval()
+
+
+def quantize(model):
+    # in place: a copy of a 1.5B fp32 model would double the peak memory
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def int8_skeleton(config):
+    """config's model as quantize() leaves it, with meta parameters and empty int8 Linears."""
+    with init_empty_weights():  # parameters on meta; buffers (rotary inv_freq) are computed for real
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=torch.float32, trust_remote_code=True)
+    for name, module in list(model.named_modules()):
+        # exact type, like quantize_dynamic's module mapping
+        if type(module) is torch.nn.Linear:
+            parent, _, child = name.rpartition(".")
+            setattr(model.get_submodule(parent), child, torch.ao.nn.quantized.dynamic.Linear(
+                module.in_features, module.out_features, bias_=module.bias is not None, dtype=torch.qint8))
+    return model
+
+
+def load_exported(export_dir):
+    export_dir = Path(export_dir)
+    config = AutoConfig.from_pretrained(export_dir, trust_remote_code=True)
+    model = int8_skeleton(config)
+    # our own artifact: the packed int8 weights are not plain tensors, so no weights_only
+    model.load_state_dict(torch.load(export_dir / WEIGHTS_NAME, weights_only=False), assign=True)
+    if any(p.is_meta for p in model.parameters()):
+        raise ValueError(f"{export_dir / WEIGHTS_NAME} does not cover every parameter of {config.model_type}")
+    return model.eval()
+
+
+@torch.inference_mode()
+def _logits(model, inputs):
+    return model(**inputs).logits.float()
+
+
+def export(base=BASE_MODEL, adapter=ADAPTER_PATH, export_dir=EXPORT_DIR) -> dict:
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = load_tokenizer(base, adapter)
+    probe = tokenizer(format_prompt(BENCH_DOC), return_tensors="pt")
+
+    t0 = time.perf_counter()
+    model = load_unmerged(base, adapter)
+    unmerged = _logits(model, probe)
+    model = model.merge_and_unload().eval()
+    merged = _logits(model, probe)
+    config = model.config
+    qmodel = quantize(model)
+    quantized = _logits(qmodel, probe)
+    t1 = time.perf_counter()
+
+    config.save_pretrained(export_dir)
+    tokenizer.save_pretrained(export_dir)
+    tmp = export_dir / f"{WEIGHTS_NAME}.tmp"
+    torch.save(qmodel.state_dict(), tmp)
+    os.replace(tmp, export_dir / WEIGHTS_NAME)
+
+    # the saved artifact must reproduce the in-memory int8 model
+    reloaded = _logits(load_exported(export_dir), probe)
+    info = {
+        "base": str(base),
+        "adapter": str(adapter),
+        "quantization": "torch.ao dynamic int8, nn.Linear",
+        "torch": torch.__version__,
+        "export_seconds": round(t1 - t0, 2),
+        "weights_bytes": (export_dir / WEIGHTS_NAME).stat().st_size,
+        "max_abs_diff_merged_vs_unmerged": float((merged - unmerged).abs().max()),
+        "max_abs_diff_int8_vs_unmerged": float((quantized - unmerged).abs().max()),
+        "max_abs_diff_reloaded_vs_int8": float((reloaded - quantized).abs().max()),
+        "next_token_agreement_int8": float((quantized.argmax(-1) == unmerged.argmax(-1)).float().mean()),
+    }
+    with open(export_dir / "export.json", "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=1)
+    return info
+
+
+# =========================
+# BENCHMARK
+# =========================
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB, -1 if neither resource nor psutil is available."""
+    try:
+        import resource  # Unix only
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return -1.0
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 1024 ** 2  # peak working set on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def _bench_child(variant, base, adapter, export_dir):
+    """Runs in its own process; prints one JSON line."""
+    if BENCH_THREADS:
+        torch.set_num_threads(BENCH_THREADS)
+    t0 = time.perf_counter()
+    if variant == "unmerged_fp32":
+        tokenizer = load_tokenizer(base, adapter)
+        model = load_unmerged(base, adapter)
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(export_dir, trust_remote_code=True)
+        model = load_exported(export_dir)
+    load_s = time.perf_counter() - t0
+
+    inputs = tokenizer(format_prompt(BENCH_DOC), return_tensors="pt")
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    gen = dict(do_sample=False, pad_token_id=pad_id)
+    with torch.inference_mode():
+        model.generate(**inputs, max_new_tokens=4, **gen)  # warm-up
+        t1 = time.perf_counter()
+        out = model.generate(**inputs, max_new_tokens=BENCH_NEW_TOKENS, min_new_tokens=BENCH_NEW_TOKENS, **gen)
+        gen_s = time.perf_counter() - t1
+
+    new = out[0][inputs["input_ids"].shape[-1]:].tolist()
+    print(json.dumps({
+        "variant": variant,
+        "load_s": load_s,
+        "tokens_per_s": len(new) / gen_s,
+        "peak_rss_mb": peak_rss_mb(),
+        "tokens": new,
+    }))
+
+
+def bench(base=BASE_MODEL, adapter=ADAPTER_PATH, export_dir=EXPORT_DIR) -> dict:
+    results = {}
+    for variant in ("unmerged_fp32", "merged_int8"):
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_bench", variant, str(base), str(adapter), str(export_dir)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{variant} benchmark failed:\n{proc.stderr}")
+        results[variant] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    ref, new = results["unmerged_fp32"], results["merged_int8"]
+    same = sum(a == b for a, b in zip(ref["tokens"], new["tokens"]))
+    print(f"{'':16}{'load s':>9}{'tokens/s':>11}{'peak RSS MB':>13}")
+    for r in (ref, new):
+        print(f"{r['variant']:16}{r['load_s']:9.2f}{r['tokens_per_s']:11.1f}{r['peak_rss_mb']:13.0f}")
+    rss = f"RSS x{new['peak_rss_mb'] / ref['peak_rss_mb']:.2f}" if ref["peak_rss_mb"] > 0 else "RSS n/a"
+    print(f"✔ int8/fp32: load x{ref['load_s'] / new['load_s']:.2f} faster, decode x{new['tokens_per_s'] / ref['tokens_per_s']:.2f}, "
+          f"{rss}; {same}/{len(ref['tokens'])} generated tokens identical")
+    return results
+
+
+# =========================
+# TINY STAND-IN
+# =========================
+
+def make_tiny(workdir):
+    """A tiny random Qwen2 model + tokenizer and a random (non-zero) LoRA adapter, for a fast end-to-end run."""
+    from peft import LoraConfig, get_peft_model
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders, trainers
+    from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+    from prompt_template import SYSTEM
+
+    base_dir, adapter_dir = Path(workdir) / "base", Path(workdir) / "adapter"
+    tok = Tokenizer(models.BPE())
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    tok.train_from_iterator([format_prompt(BENCH_DOC), SYSTEM],
+                            trainers.BpeTrainer(vocab_size=512, special_tokens=["<|endoftext|>"],
+                                                initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, eos_token="<|endoftext|>", pad_token="<|endoftext|>")
+
+    torch.manual_seed(0)
+    config = Qwen2Config(vocab_size=tok.get_vocab_size(), hidden_size=64, intermediate_size=128,
+                         num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2,
+                         max_position_embeddings=1024, tie_word_embeddings=True)
+    model = Qwen2ForCausalLM(config).eval()
+    model.save_pretrained(base_dir)
+    tokenizer.save_pretrained(base_dir)
+
+    lora = LoraConfig(r=8, lora_alpha=16, init_lora_weights=False, task_type="CAUSAL_LM",
+                      target_modules=["q_proj", "k_proj", "v_proj", "o_proj", "gate_proj", "up_proj", "down_proj"])
+    get_peft_model(model, lora).save_pretrained(adapter_dir)
+    return base_dir, adapter_dir
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "_bench":
+        _bench_child(*sys.argv[2:6])
+        return
+    if command not in ("export", "bench", "tiny"):
+        print("Usage: python export_cpu_model.py [export|bench|tiny] [base] [adapter] [export_dir]")
+        sys.exit(1)
+
+    if command == "tiny":
+        with tempfile.TemporaryDirectory() as workdir:
+            base, adapter = make_tiny(workdir)
+            export_dir = Path(workdir) / "export"
+            print(json.dumps(export(base, adapter, export_dir), indent=1))
+            bench(base, adapter, export_dir)
+        return
+
+    base, adapter, export_dir = (sys.argv[2:5] + [BASE_MODEL, ADAPTER_PATH, EXPORT_DIR][len(sys.argv[2:5]):])
+    if command == "export":
+        info = export(base, adapter, export_dir)
+        print(json.dumps(info, indent=1))
+        print(f"✅ {export_dir}")
+    else:
+        bench(base, adapter, export_dir)
+
+
+if __name__ == "__main__":
+    main()
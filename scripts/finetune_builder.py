@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import gzip
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+from chunk_quality import BATCH_SIZE, features, first_reason
+from parallel import ordered_imap
+
+
+# Streaming fine-tune builder shared by Build_Acts_Finetune_jsonl.py and Build_gazettes_Finetune_jsonl.py.
+#
+# The chunks file is read in batches of BATCH_SIZE lines. Each batch goes to a worker,
+# which drops near-duplicates and applies the chunk_quality filters. The parent writes
+# one row per task for every kept chunk straight into gzip JSONL shards. ordered_imap
+# keeps input order and bounds the batches in flight, so memory stays flat however
+# large the corpus is.
+#
+# Splits are assigned while streaming, per document: blake2b(SPLIT_SALT + doc_id) read as
+# a number in [0, 1) picks the split from the cumulative ratios. Every row of a document
+# (all its chunks, every task) lands in the same split, in every run and on every machine;
+# changing the ratios only moves the documents near the edges.
+#
+# <out_dir>/
+#   instructions.json          {task: {"instruction": ..., "output": placeholder}}, written once
+#   shards/<split>/finetune-00000.jsonl.gz
+#                              {"id", "doc_id", "task", "input", "output"}: "task" refers to instructions.json
+#   index.json                 per split: shard files with row counts and sizes; kept/dropped counts
+#
+# A shard is closed once it holds SHARD_MAX_BYTES of uncompressed JSONL.
+# A split loads directly with datasets.load_dataset("json", data_files=".../shards/train/*.jsonl.gz").
+# iter_rows(out_dir, split) yields the rows with their instruction filled back in, and
+#   python finetune_builder.py <out_dir> [flat.jsonl [split]]
+# prints the index or writes the old single-file finetune.jsonl (all splits, or one).
+
+SHARD_MAX_BYTES = 64 * 1024 * 1024
+SPLITS = {"train": 0.8, "val": 0.1, "test": 0.1}
+SPLIT_SALT = "split-v1"
+COMPRESS_LEVEL = 6
+SHARD_PATTERN = "finetune-{:05d}.jsonl.gz"
+
+
+def chunk_id(r: dict) -> str:
+    # supports either "chunk_id" or "id" depending on your stage output
+    cid = r.get("chunk_id") or r.get("id")
+    if cid is None:
+        # fallback: create a stable id from doc_id + index if present
+        doc_id = r.get("doc_id", "unknown_doc")
+        idx = r.get("index", r.get("chunk_index", "0"))
+        cid = f"{doc_id}_{idx}"
+    return cid
+
+
+def assign_split(doc_id: str, splits=SPLITS, salt=SPLIT_SALT) -> str:
+    h = hashlib.blake2b(f"{salt}{doc_id}".encode("utf-8"), digest_size=8).digest()
+    u = int.from_bytes(h, "big") / 2**64
+    total = sum(splits.values())
+    edge = 0.0
+    for name, ratio in splits.items():
+        edge += ratio / total
+        if u < edge:
+            return name
+    return name
+
+
+def iter_batches(path, size=BATCH_SIZE):
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            batch.append(line)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+# Worker side: the filter and the near-duplicate ids are set once per process
+_spec = None
+
+
+def _init_worker(spec):
+    global _spec
+    _spec = spec
+
+
+def _filter_batch(lines):
+    """(kept (chunk id, doc id, text) rows, Counter of drop reasons) for one batch of JSONL lines."""
+    drop_masks, keywords, duplicates = _spec
+    dropped = Counter()
+    rows = []
+    for line in lines:
+        r = json.loads(line)
+        cid = chunk_id(r)
+        if cid in duplicates:
+            dropped["near_duplicate"] += 1
+        else:
+            rows.append((cid, r.get("doc_id") or cid.split("::")[0], r.get("text", "") or ""))
+
+    masks = drop_masks(features([text for _, _, text in rows], keywords))
+    reason = first_reason(masks, len(rows))
+    for i, name in enumerate(masks):
+        dropped[name] += int((reason == i).sum())
+    return [row for row, why in zip(rows, reason) if why < 0], dropped
+
+
+class ShardWriter:
+    def __init__(self, shard_dir, max_bytes=SHARD_MAX_BYTES):
+        self.dir = Path(shard_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.shards = []
+        self.f = None
+
+    def _open(self):
+        self.path = self.dir / SHARD_PATTERN.format(len(self.shards))
+        self.f = gzip.open(self.path, "wb", compresslevel=COMPRESS_LEVEL)
+        self.rows = self.size = 0
+
+    def _close(self):
+        self.f.close()
+        self.f = None
+        self.shards.append({"file": self.path.name, "rows": self.rows,
+                            "bytes": self.size, "compressed_bytes": self.path.stat().st_size})
+
+    def write(self, row: dict):
+        line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+        if self.f is not None and self.size + len(line) > self.max_bytes:
+            self._close()
+        if self.f is None:
+            self._open()
+        self.f.write(line)
+        self.rows += 1
+        self.size += len(line)
+
+    def close(self):
+        if self.f is not None:
+            self._close()
+        return self.shards
+
+
+def build(in_path, out_dir, tasks, drop_masks, keywords=True, duplicates=frozenset(), splits=SPLITS,
+          workers=None, window=None):
+    """
+    tasks: {task: {"instruction": ..., "output": placeholder}}; every kept chunk gets one row per task.
+    drop_masks: chunk_quality.acts_drop_masks or gazette_drop_masks (keywords: whether they need the regex counts).
+    splits: {split: ratio}, assigned per doc_id (assign_split).
+    Returns the index written to <out_dir>/index.json.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "instructions.json", "w", encoding="utf-8") as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=1)
+
+    kept = 0
+    dropped = Counter()
+    writers = {name: ShardWriter(out_dir / "shards" / name) for name in splits}
+    split_of = {}  # doc_id -> split
+    chunks = Counter()
+    results = ordered_imap(_filter_batch, iter_batches(in_path), workers=workers, window=window,
+                           initializer=_init_worker, initargs=((drop_masks, keywords, duplicates),))
+    for rows, batch_dropped in results:
+        dropped.update(batch_dropped)
+        kept += len(rows)
+        for cid, doc_id, text in rows:
+            if doc_id not in split_of:
+                split_of[doc_id] = assign_split(doc_id, splits)
+            split = split_of[doc_id]
+            chunks[split] += 1
+            for task, spec in tasks.items():
+                writers[split].write({"id": cid, "doc_id": doc_id, "task": task, "input": text,
+                                      "output": spec.get("output", "")})
+
+    split_index = {}
+    for name, writer in writers.items():
+        shards = writer.close()
+        split_index[name] = {
+            "ratio": splits[name],
+            "documents": sum(1 for s in split_of.values() if s == name),
+            "chunks": chunks[name],
+            "rows": sum(s["rows"] for s in shards),
+            "shards": [dict(s, file=f"shards/{name}/{s['file']}") for s in shards],
+        }
+
+    # shards left over from an earlier, larger run or from splits no longer configured
+    written = {s["file"] for split in split_index.values() for s in split["shards"]}
+    for old in (out_dir / "shards").rglob(SHARD_PATTERN.replace("{:05d}", "*")):
+        if old.relative_to(out_dir).as_posix() not in written:
+            old.unlink()
+
+    index = {
+        "source": str(in_path),
+        "instructions": "instructions.json",
+        "chunks": kept,
+        "rows": sum(s["rows"] for s in split_index.values()),
+        "dropped": dict(dropped),
+        "split_salt": SPLIT_SALT,
+        "splits": split_index,
+    }
+    tmp = out_dir / "index.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, out_dir / "index.json")
+    return index
+
+
+def load_index(out_dir) -> dict:
+    return json.loads((Path(out_dir) / "index.json").read_text(encoding="utf-8"))
+
+
+def iter_rows(out_dir, split=None):
+    """
+    The rows of one split (or of every split, one after another) in shard order,
+    with "instruction" filled in from instructions.json.
+    """
+    out_dir = Path(out_dir)
+    index = load_index(out_dir)
+    tasks = json.loads((out_dir / index["instructions"]).read_text(encoding="utf-8"))
+    for name in ([split] if split else index["splits"]):
+        for shard in index["splits"][name]["shards"]:
+            with gzip.open(out_dir / shard["file"], "rt", encoding="utf-8") as f:
+                for line in f:
+                    r = json.loads(line)
+                    yield {"id": r["id"], "task": r["task"], "instruction": tasks[r["task"]]["instruction"],
+                           "input": r["input"], "output": r["output"]}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python finetune_builder.py path/to/finetune_dir [flat.jsonl [split]]")
+        sys.exit(1)
+    out_dir = Path(sys.argv[1])
+    index = load_index(out_dir)
+    print(f"✔ {index['chunks']} chunks, {index['rows']} rows from {index['source']}")
+    print(f"   dropped: {index['dropped']}")
+    for name, split in index["splits"].items():
+        print(f"   {name}: {split['documents']} documents, {split['chunks']} chunks, {split['rows']} rows "
+              f"({split['rows'] / max(index['rows'], 1):.1%}, ratio {split['ratio']})")
+        for s in split["shards"]:
+            print(f"      {s['file']}: {s['rows']} rows, {s['bytes'] / 2**20:.1f} MB -> {s['compressed_bytes'] / 2**20:.1f} MB")
+
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w", encoding="utf-8") as f:
+            for row in iter_rows(out_dir, sys.argv[3] if len(sys.argv) > 3 else None):
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        print(f"✅ {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import zlib
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+
+# Near-duplicate chunks across chunks.jsonl / gazette_chunks.jsonl (MinHash + LSH).
+#
+# Every chunk becomes a set of word 3-gram hashes; NUM_PERM MinHash values estimate the
+# Jaccard similarity of two such sets. The signature is cut into BANDS bands of ROWS values
+# and two chunks are candidates only if one whole band is equal, so the work grows with the
+# number of chunks, not with the number of pairs. A candidate pair merges its two clusters
+# (union-find) only if their representatives pass THRESHOLD on the full signature, so a
+# chain of small edits cannot pull unrelated chunks into one cluster.
+#
+# Each cluster keeps its first chunk (input order) as representative; the chunk_ids of the
+# other members go to one list per corpus, duplicates_path(name), which the matching
+# Build_*_Finetune_jsonl.py script skips. "all" clusters both corpora together, so a
+# gazette chunk that repeats an act chunk lands in the gazettes list.
+# Each list starts with the sha256 of the chunks file it was built from; load_duplicates()
+# ignores a list (with a warning) once that file has changed, since chunk_ids are only
+# positions within a document and would now name other chunks.
+#
+#   python near_dedup.py [acts|gazettes|all]
+
+CHUNK_FILES = {
+    "acts": "../Dataset_Acts_Stage_1/chunks.jsonl",
+    "gazettes": "../Dataset_Gazettes_Stage_1/gazette_chunks.jsonl",
+}
+OUT_DIR = Path("../Dataset_Dedup")
+DUPLICATES_NAME = "{}_duplicate_chunk_ids.txt"
+CLUSTERS_NAME = "{}_clusters.jsonl"
+
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 16          # BANDS * ROWS == NUM_PERM; candidates from about (1/BANDS)**(1/ROWS) ~ 0.7 Jaccard
+ROWS = 8
+THRESHOLD = 0.8     # estimated Jaccard needed to merge two candidates
+SEED = 1
+
+_PRIME = (1 << 31) - 1  # a * x + b stays below 2**64 for 32-bit x
+
+
+def _permutations(num_perm=NUM_PERM, seed=SEED):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def shingles(text: str, word_ids: dict) -> np.ndarray:
+    """Distinct 32-bit hashes of the word 3-grams (or of the whole text if it is shorter)."""
+    words = text.split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    for w in words:
+        if w not in word_ids:
+            word_ids[w] = zlib.crc32(w.encode("utf-8"))
+    ids = np.fromiter((word_ids[w] for w in words), dtype=np.uint64, count=len(words))
+    k = min(SHINGLE_WORDS, len(ids))
+    h = np.zeros(len(ids) - k + 1, dtype=np.uint64)
+    for i in range(k):
+        h = (h * np.uint64(0x01000193) + ids[i:len(ids) - k + 1 + i]) & np.uint64(0xFFFFFFFF)
+    return np.unique(h)
+
+
+def minhash(sh: np.ndarray, a, b) -> np.ndarray:
+    if not len(sh):
+        return np.full(len(a), _PRIME, dtype=np.uint32)
+    return ((np.outer(sh, a) + b) % np.uint64(_PRIME)).min(axis=0).astype(np.uint32)
+
+
+def signatures(texts) -> np.ndarray:
+    a, b = _permutations()
+    word_ids = {}
+    sig = np.empty((len(texts), NUM_PERM), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        sig[i] = minhash(shingles(text, word_ids), a, b)
+    return sig
+
+
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster(sig: np.ndarray, bands=BANDS, rows=ROWS, threshold=THRESHOLD):
+    """Root index of every chunk's cluster; the root is the cluster's first chunk."""
+    n = len(sig)
+    parent = list(range(n))
+    checked = set()
+    for band in range(bands):
+        buckets = {}
+        part = np.ascontiguousarray(sig[:, band * rows:(band + 1) * rows])
+        for i in range(n):
+            first = buckets.setdefault(part[i].tobytes(), i)
+            if first == i or (first, i) in checked:
+                continue
+            checked.add((first, i))
+            ri, rf = find(parent, i), find(parent, first)
+            if ri != rf and np.count_nonzero(sig[ri] == sig[rf]) >= threshold * sig.shape[1]:
+                parent[max(ri, rf)] = min(ri, rf)
+    return [find(parent, i) for i in range(n)]
+
+
+def load_chunks(paths):
+    rows = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                r = json.loads(line)
+                rows.append((r["chunk_id"], r.get("text", "")))
+    return rows
+
+
+def duplicates_path(name) -> Path:
+    return OUT_DIR / DUPLICATES_NAME.format(name)
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_duplicates(path, chunk_ids, chunks_path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# sha256 {file_sha256(chunks_path)} {chunks_path}\n")
+        f.writelines(cid + "\n" for cid in chunk_ids)
+
+
+def load_duplicates(path, chunks_path) -> set:
+    """chunk_ids to skip; empty if near_dedup.py has not been run or chunks_path changed since."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().split()
+        ids = {line.rstrip("\n") for line in f if line.strip()}
+    expected = file_sha256(chunks_path)
+    if header[:2] != ["#", "sha256"] or header[2:3] != [expected]:
+        print(f"⚠ {path} was not built from the current {chunks_path}; ignoring it (re-run near_dedup.py)")
+        return set()
+    return ids
+
+
+def main():
+    target = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if target not in ("acts", "gazettes", "all"):
+        print("Usage: python near_dedup.py [acts|gazettes|all]")
+        sys.exit(1)
+    names = [name for name in (CHUNK_FILES if target == "all" else [target]) if os.path.exists(CHUNK_FILES[name])]
+    paths = [CHUNK_FILES[name] for name in names]
+    if not paths:
+        print(f"❌ No chunk files found for {target}")
+        return
+
+    rows, corpus = [], []
+    for name in names:
+        part = load_chunks([CHUNK_FILES[name]])
+        rows.extend(part)
+        corpus.extend([name] * len(part))
+    sig = signatures([text for _, text in rows])
+    roots = cluster(sig)
+
+    members = {}
+    for i, root in enumerate(roots):
+        members.setdefault(root, []).append(i)
+    clusters = sorted((m for m in members.values() if len(m) > 1), key=len, reverse=True)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    clusters_path = OUT_DIR / CLUSTERS_NAME.format(target)
+    with open(clusters_path, "w", encoding="utf-8") as f:
+        for m in clusters:
+            f.write(json.dumps({"representative": rows[m[0]][0], "size": len(m),
+                                "members": [rows[i][0] for i in m]}, ensure_ascii=False) + "\n")
+    written = []
+    for name in names:
+        path = duplicates_path(name)
+        write_duplicates(path, [rows[i][0] for m in clusters for i in m[1:] if corpus[i] == name], CHUNK_FILES[name])
+        written.append(str(path))
+
+    dropped = sum(len(m) - 1 for m in clusters)
+    print(f"✔ {len(rows)} chunks from {', '.join(paths)}")
+    print(f"   {len(clusters)} near-duplicate clusters, {dropped} chunks dropped ({dropped / max(len(rows), 1):.1%})")
+    sizes = Counter(len(m) for m in clusters)
+    print("   cluster sizes: " + ", ".join(f"{s}x{c}" for s, c in sorted(sizes.items())))
+    for m in clusters[:5]:
+        print(f"   {len(m):5d}  {rows[m[0]][0]}  {rows[m[0]][1][:60]!r}")
+    print(f"✅ {', '.join(written)}, {clusters_path}")
+
+
+if __name__ == "__main__":
+    main()
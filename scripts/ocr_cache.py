@@ -0,0 +1,122 @@
+import os
+import hashlib
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+# On-disk cache of OCR results, keyed by what Tesseract actually sees:
+# the rendered page bytes + DPI + language + Tesseract version.
+# A re-run, or the same PDF under another file name, gets its pages from here.
+#
+# The adaptive-DPI low pass stores its text and mean word confidence as JSON under
+# a key of its own (kind), so it never collides with the plain-text entry of the same image.
+#
+# put() keeps a running total of the bytes on disk (one directory walk per process,
+# on its first put) and evicts least recently used pages down to LOW_WATER * max_bytes
+# as soon as the total passes max_bytes, so the bound holds during a long run.
+# Worker processes each count their own writes; evict() re-walks the directory, so
+# the others' writes are picked up at every eviction.
+
+LOW_WATER = 0.9
+
+_tesseract_version = None
+
+
+def tesseract_version() -> str:
+    # spawns tesseract once per process
+    global _tesseract_version
+    if _tesseract_version is None:
+        try:
+            _tesseract_version = str(pytesseract.get_tesseract_version())
+        except pytesseract.TesseractNotFoundError:
+            if tesserocr is None:
+                raise
+            # tesserocr-only install: use the linked library's version line
+            _tesseract_version = tesserocr.tesseract_version().splitlines()[0]
+    return _tesseract_version
+
+
+class OcrPageCache:
+    def __init__(self, cache_dir, max_bytes=5 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.used = None  # bytes on disk as far as this process knows; counted on the first put()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, image, dpi, lang, kind=None) -> str:
+        h = hashlib.sha256()
+        h.update(f"{image.mode}|{image.size}|{dpi}|{lang}|{tesseract_version()}|".encode("utf-8"))
+        if kind:
+            h.update(f"{kind}|".encode("utf-8"))
+        h.update(image.tobytes())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used for eviction
+        return text
+
+    def put(self, key, text):
+        if self.used is None:
+            self.used = self.size()[0]
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.used += os.path.getsize(tmp)
+        os.replace(tmp, path)
+        if self.used > self.max_bytes:
+            self.evict(int(self.max_bytes * LOW_WATER))
+
+    def size(self):
+        total, entries = 0, []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                total += st.st_size
+                entries.append((st.st_mtime, st.st_size, path))
+        return total, entries
+
+    def evict(self, target=None):
+        """Drop least recently used pages until the cache fits in target (default max_bytes). Returns pages removed."""
+        target = self.max_bytes if target is None else target
+        total, entries = self.size()
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.used = total
+        return removed
+
+
+def format_cache_stats(hits, misses, cache=None) -> str:
+    lookups = hits + misses
+    rate = 100.0 * hits / lookups if lookups else 0.0
+    line = f"{hits} hits, {misses} misses ({rate:.1f}% hit rate)"
+    if cache is not None:
+        total, entries = cache.size()
+        line += f", {len(entries)} pages / {total / 1024 ** 2:.1f} MB on disk"
+    return line
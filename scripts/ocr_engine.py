@@ -0,0 +1,494 @@
+import os
+import re
+import json
+import time
+from collections import Counter, namedtuple
+
+import pytesseract
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from parallel import ordered_imap
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # text-layer routing is skipped without pypdf
+    PdfReader = None
+
+try:
+    import tesserocr
+except ImportError:  # only needed for the "tesserocr" backend
+    tesserocr = None
+
+
+# Shared OCR helpers for pdftotext.py / pdftotext2.py
+
+# Page routes, reported at the end of a run
+ROUTE_TEXT_LAYER = "text_layer"
+ROUTE_OCR = "ocr"
+ROUTE_OCR_CACHED = "ocr_cached"
+
+# A text layer shorter than this is treated as empty (scanned page)
+MIN_TEXT_LAYER_CHARS = 50
+
+# Adaptive mode: OCR at low_dpi first, re-render at high_dpi only when the
+# mean Tesseract word confidence of the page is below min_conf
+AdaptiveDpi = namedtuple("AdaptiveDpi", ["low_dpi", "high_dpi", "min_conf"])
+
+
+# =========================
+# OCR BACKENDS
+# =========================
+
+# "pytesseract": one tesseract subprocess per page, image passed through a temp file
+# "tesserocr":   Tesseract loaded once per process through its C API, image passed in memory
+OCR_BACKENDS = ("pytesseract", "tesserocr")
+
+_backend = "pytesseract"
+_tessdata_path = None
+_apis = {}             # lang -> PyTessBaseAPI, kept for the life of the process
+_page_separators = {}  # lang -> what the CLI appends after a page
+
+
+def set_ocr_backend(name, tessdata_path=None):
+    global _backend, _tessdata_path
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend {name!r}, expected one of {OCR_BACKENDS}")
+    if name == "tesserocr" and tesserocr is None:
+        raise ImportError("OCR backend 'tesserocr' needs the tesserocr package")
+    _backend, _tessdata_path = name, tessdata_path
+
+
+def _tess_api(lang):
+    api = _apis.get(lang)
+    if api is None:
+        if _tessdata_path:
+            api = tesserocr.PyTessBaseAPI(path=_tessdata_path, lang=lang)
+        else:
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+        _apis[lang] = api
+    return api
+
+
+def _cli_page_separator(lang):
+    """
+    The tesseract CLI writes its page_separator (a form feed by default) into
+    the .txt output. Measure it once on a blank page so the tesserocr backend
+    returns byte-identical text to pytesseract.image_to_string.
+    """
+    if lang not in _page_separators:
+        try:
+            _page_separators[lang] = pytesseract.image_to_string(Image.new("L", (64, 64), 255), lang=lang)
+        except pytesseract.TesseractNotFoundError:
+            _page_separators[lang] = "\f"
+    return _page_separators[lang]
+
+
+def _tess_recognize(image, lang):
+    api = _tess_api(lang)
+    # same encoding pytesseract would write to its temp file, just kept in memory
+    image, _ = pytesseract.pytesseract.prepare(image)
+    api.SetImage(image)
+    return api.GetUTF8Text() + _cli_page_separator(lang), api
+
+
+def tesseract_image_to_string(image, lang="sin") -> str:
+    if _backend == "tesserocr":
+        text, _ = _tess_recognize(image, lang)
+        return text
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def count_pages(input_pdf, poppler_path=None) -> int:
+    info = pdfinfo_from_path(input_pdf, poppler_path=poppler_path)
+    return int(info["Pages"])
+
+
+def render_page(input_pdf, page_no, dpi=300, poppler_path=None):
+    # page_no is 1-based, like pdftoppm
+    images = convert_from_path(
+        input_pdf,
+        dpi=dpi,
+        first_page=page_no,
+        last_page=page_no,
+        poppler_path=poppler_path
+    )
+    return images[0]
+
+
+def ocr_image(image, lang="sin", dpi=300, cache=None):
+    """OCR one rendered page, going through the page cache if there is one. Returns (route, text)."""
+    if cache is None:
+        return ROUTE_OCR, tesseract_image_to_string(image, lang=lang)
+    key = cache.key(image, dpi, lang)
+    text = cache.get(key)
+    if text is not None:
+        return ROUTE_OCR_CACHED, text
+    text = tesseract_image_to_string(image, lang=lang)
+    cache.put(key, text)
+    return ROUTE_OCR, text
+
+
+def ocr_page(input_pdf, page_no, lang="sin", dpi=300, poppler_path=None, cache=None):
+    image = render_page(input_pdf, page_no, dpi=dpi, poppler_path=poppler_path)
+    try:
+        return ocr_image(image, lang=lang, dpi=dpi, cache=cache)
+    finally:
+        image.close()
+
+
+def write_pages(output_txt, page_texts):
+    """
+    Write pages as they arrive, same layout as the original pdf_to_text
+    (pages separated by a blank line). Returns the number of pages written.
+    """
+    n_pages = 0
+    with open(output_txt, "w", encoding="utf-8") as f:
+        for text in page_texts:
+            if n_pages:
+                f.write("\n\n")
+            f.write(text)
+            f.flush()
+            n_pages += 1
+    return n_pages
+
+
+# =========================
+# TEXT LAYER ROUTING
+# =========================
+
+def has_sinhala_unicode(text: str, min_chars: int = 30) -> bool:
+    # Sinhala Unicode range: U+0D80–U+0DFF
+    sinhala_chars = re.findall(r"[\u0D80-\u0DFF]", text)
+    return len(sinhala_chars) >= min_chars
+
+
+def looks_garbled(text: str) -> bool:
+    # Heuristic: lots of weird symbols/carets and very low Sinhala Unicode presence
+    weird = len(re.findall(r"[\^&%$#@_~=<>\\|]", text))
+    letters = len(re.findall(r"[A-Za-z]", text))
+    return (weird > 30 and letters > 200 and not has_sinhala_unicode(text, 5))
+
+
+def open_text_layer(input_pdf):
+    if PdfReader is None:
+        return None
+    try:
+        return PdfReader(input_pdf)
+    except Exception as e:
+        print(f"Cannot read text layer of {os.path.basename(input_pdf)}: {e}")
+        return None
+
+
+def page_text_layer(reader, page_no):
+    """
+    Return the page's embedded text if it is usable Sinhala Unicode,
+    or None when the page has to be OCR'd (scanned, legacy font, garbled).
+    """
+    try:
+        text = reader.pages[page_no - 1].extract_text() or ""
+    except Exception:
+        return None
+    text = text.replace("\x00", " ")
+    if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+        return None
+    if not has_sinhala_unicode(text) or looks_garbled(text):
+        return None
+    return text
+
+
+def format_route_stats(stats) -> str:
+    line = f"{stats[ROUTE_TEXT_LAYER]} text-layer, {stats[ROUTE_OCR]} OCR pages"
+    if stats[ROUTE_OCR_CACHED]:
+        line += f", {stats[ROUTE_OCR_CACHED]} from OCR cache"
+    return line
+
+
+# =========================
+# ADAPTIVE DPI
+# =========================
+
+def mean_word_confidence(tsv: str):
+    """Mean confidence of the recognised words in Tesseract's TSV output, None for an empty page."""
+    lines = tsv.splitlines()
+    if not lines:
+        return None
+    header = lines[0].split("\t")
+    conf_col, text_col = header.index("conf"), header.index("text")
+    confs = []
+    for row in lines[1:]:
+        cells = row.split("\t")
+        if len(cells) <= text_col or not cells[text_col].strip():
+            continue
+        conf = float(cells[conf_col])
+        if conf >= 0:
+            confs.append(conf)
+    return sum(confs) / len(confs) if confs else None
+
+
+def _recognize_with_confidence(image, lang):
+    if _backend == "tesserocr":
+        text, api = _tess_recognize(image, lang)
+        confs = [c for c in api.AllWordConfidences() if c >= 0]
+        return text, (sum(confs) / len(confs) if confs else None)
+    # one tesseract run gives both the plain text and the per-word confidences
+    text, tsv = pytesseract.run_and_get_multiple_output(image, extensions=["txt", "tsv"], lang=lang)
+    return text, mean_word_confidence(tsv)
+
+
+def ocr_image_with_confidence(image, lang="sin", dpi=300, cache=None):
+    """Like ocr_image, plus the mean word confidence. Returns (route, text, confidence)."""
+    if cache is None:
+        return (ROUTE_OCR, *_recognize_with_confidence(image, lang))
+    # the backends compute confidences differently, so each gets its own entries
+    key = cache.key(image, dpi, lang, kind=f"confidence|{_backend}")
+    cached = cache.get(key)
+    if cached is not None:
+        entry = json.loads(cached)
+        return ROUTE_OCR_CACHED, entry["text"], entry["confidence"]
+    text, conf = _recognize_with_confidence(image, lang)
+    cache.put(key, json.dumps({"text": text, "confidence": conf}, ensure_ascii=False))
+    return ROUTE_OCR, text, conf
+
+
+def ocr_page_adaptive(input_pdf, page_no, adaptive, lang="sin", poppler_path=None, cache=None):
+    """OCR at adaptive.low_dpi and upgrade to high_dpi if needed. Returns (route, text, page_report)."""
+    start = time.perf_counter()
+    image = render_page(input_pdf, page_no, dpi=adaptive.low_dpi, poppler_path=poppler_path)
+    try:
+        route, text, conf = ocr_image_with_confidence(image, lang=lang, dpi=adaptive.low_dpi, cache=cache)
+    finally:
+        image.close()
+
+    report = {
+        "page": page_no,
+        "confidence": conf,
+        "dpi": adaptive.low_dpi,
+        "low_seconds": time.perf_counter() - start,
+        "high_seconds": None,
+        "low_cached": route == ROUTE_OCR_CACHED,
+    }
+    # empty pages (no words at all) are not worth a second render
+    if conf is not None and conf < adaptive.min_conf:
+        start = time.perf_counter()
+        route, text = ocr_page(input_pdf, page_no, lang=lang, dpi=adaptive.high_dpi, poppler_path=poppler_path, cache=cache)
+        report["dpi"] = adaptive.high_dpi
+        report["high_seconds"] = time.perf_counter() - start
+    return route, text, report
+
+
+def write_adaptive_report(report_dir, input_pdf, page_reports, adaptive):
+    """
+    Write <stem>.adaptive.json with the pages that were upgraded and an
+    estimate of the time saved against rendering every page at high_dpi.
+    """
+    upgraded = [r for r in page_reports if r["high_seconds"] is not None]
+    # pages whose low-DPI pass came from the OCR cache say nothing about OCR time
+    timed = [r for r in page_reports if not r["low_cached"]]
+    kept = [r for r in timed if r["high_seconds"] is None]
+    upgraded_timed = [r for r in timed if r["high_seconds"] is not None]
+
+    # cost of a high-DPI pass relative to a low-DPI one: measured on the
+    # upgraded pages when there are any, otherwise scaled by pixel count
+    low_on_upgraded = sum(r["low_seconds"] for r in upgraded_timed)
+    if low_on_upgraded > 0:
+        ratio = sum(r["high_seconds"] for r in upgraded_timed) / low_on_upgraded
+    else:
+        ratio = (adaptive.high_dpi / adaptive.low_dpi) ** 2
+    saved = sum(r["low_seconds"] * (ratio - 1) for r in kept) - low_on_upgraded
+    spent = sum(r["low_seconds"] + (r["high_seconds"] or 0) for r in page_reports)
+
+    summary = {
+        "document": os.path.basename(input_pdf),
+        "low_dpi": adaptive.low_dpi,
+        "high_dpi": adaptive.high_dpi,
+        "min_conf": adaptive.min_conf,
+        "ocr_pages": len(page_reports),
+        "pages_upgraded": len(upgraded),
+        "upgraded_pages": [r["page"] for r in upgraded],
+        "seconds_spent": round(spent, 2),
+        "estimated_seconds_saved": round(saved, 2),
+        "high_to_low_cost_ratio": round(ratio, 2),
+        "page_details": [
+            {
+                "page": r["page"],
+                "confidence": None if r["confidence"] is None else round(r["confidence"], 1),
+                "dpi": r["dpi"],
+                "seconds": round(r["low_seconds"] + (r["high_seconds"] or 0), 3),
+            }
+            for r in page_reports
+        ],
+    }
+
+    os.makedirs(report_dir, exist_ok=True)
+    out_path = os.path.join(report_dir, os.path.splitext(os.path.basename(input_pdf))[0] + ".adaptive.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+# =========================
+# STREAMING MODE
+# =========================
+
+def contiguous_runs(pages):
+    """[1, 2, 3, 7, 9, 10] -> [(1, 3), (7, 7), (9, 10)]"""
+    runs = []
+    for p in pages:
+        if runs and p == runs[-1][1] + 1:
+            runs[-1][1] = p
+        else:
+            runs.append([p, p])
+    return [tuple(r) for r in runs]
+
+
+def iter_routed_pages(input_pdf, stats, lang="sin", dpi=300, poppler_path=None, window=1, use_text_layer=True,
+                      cache=None, adaptive=None, page_reports=None):
+    """
+    Yield page texts in order, `window` pages at a time.
+    Pages with a usable text layer are never rasterized; the rest are
+    rendered and OCR'd, so peak memory does not grow with the page count.
+    In adaptive mode OCR pages are rendered one by one and their reports
+    are appended to page_reports.
+    """
+    reader = open_text_layer(input_pdf) if use_text_layer else None
+    n_pages = len(reader.pages) if reader is not None else count_pages(input_pdf, poppler_path)
+
+    for first in range(1, n_pages + 1, window):
+        last = min(first + window - 1, n_pages)
+        texts = {}
+        if reader is not None:
+            for page_no in range(first, last + 1):
+                text = page_text_layer(reader, page_no)
+                if text is not None:
+                    texts[page_no] = text
+                    stats[ROUTE_TEXT_LAYER] += 1
+
+        need_ocr = [p for p in range(first, last + 1) if p not in texts]
+        if need_ocr and adaptive is not None:
+            for page_no in need_ocr:
+                route, texts[page_no], report = ocr_page_adaptive(
+                    input_pdf, page_no, adaptive, lang=lang, poppler_path=poppler_path, cache=cache
+                )
+                stats[route] += 1
+                page_reports.append(report)
+        elif need_ocr:
+            # one render per run of consecutive OCR pages: text-layer pages in between are never rasterized
+            for run_first, run_last in contiguous_runs(need_ocr):
+                images = convert_from_path(
+                    input_pdf,
+                    dpi=dpi,
+                    first_page=run_first,
+                    last_page=run_last,
+                    poppler_path=poppler_path
+                )
+                for page_no, image in zip(range(run_first, run_last + 1), images):
+                    route, texts[page_no] = ocr_image(image, lang=lang, dpi=dpi, cache=cache)
+                    stats[route] += 1
+                    image.close()
+                del images
+
+        for page_no in range(first, last + 1):
+            yield texts.pop(page_no)
+
+
+def ocr_pdf_streaming(input_pdf, output_txt, lang="sin", dpi=300, poppler_path=None, window=1, use_text_layer=True,
+                      cache=None, adaptive=None, report_dir=None):
+    """Extract, OCR and write a small window of pages at a time. Returns per-route page counts."""
+    stats = Counter()
+    page_reports = []
+    page_texts = iter_routed_pages(
+        input_pdf,
+        stats,
+        lang=lang,
+        dpi=dpi,
+        poppler_path=poppler_path,
+        window=window,
+        use_text_layer=use_text_layer,
+        cache=cache,
+        adaptive=adaptive,
+        page_reports=page_reports
+    )
+    write_pages(output_txt, page_texts)
+    if adaptive is not None and report_dir:
+        write_adaptive_report(report_dir, input_pdf, page_reports, adaptive)
+    return stats
+
+
+# =========================
+# PARALLEL MODE
+# =========================
+
+# Per-worker reader for the PDF currently being processed (tasks arrive grouped by PDF)
+_reader_path = None
+_reader = None
+_cache = None
+
+
+def _init_worker(tesseract_cmd, cache, backend, tessdata_path):
+    global _cache
+    # worker processes do not see the settings made by the calling script
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    set_ocr_backend(backend, tessdata_path)
+    _cache = cache
+
+
+def _worker_text_layer(input_pdf, page_no):
+    global _reader_path, _reader
+    if _reader_path != input_pdf:
+        _reader_path, _reader = input_pdf, open_text_layer(input_pdf)
+    return page_text_layer(_reader, page_no) if _reader is not None else None
+
+
+def _ocr_task(task):
+    input_pdf, page_no, lang, dpi, poppler_path, use_text_layer, adaptive = task
+    if use_text_layer:
+        text = _worker_text_layer(input_pdf, page_no)
+        if text is not None:
+            return ROUTE_TEXT_LAYER, text, None
+    if adaptive is not None:
+        return ocr_page_adaptive(input_pdf, page_no, adaptive, lang=lang, poppler_path=poppler_path, cache=_cache)
+    route, text = ocr_page(input_pdf, page_no, lang=lang, dpi=dpi, poppler_path=poppler_path, cache=_cache)
+    return route, text, None
+
+
+def ocr_pdfs_parallel(jobs, lang="sin", dpi=300, poppler_path=None, workers=None, use_text_layer=True, cache=None,
+                      adaptive=None, report_dir=None):
+    """
+    Extract/OCR every page of every (input_pdf, output_txt) job on a process pool.
+    Pages from all PDFs share the pool; each .txt is written in page order
+    as its pages come back. Returns per-route page counts for the whole run.
+    """
+    page_counts = [count_pages(pdf, poppler_path) for pdf, _ in jobs]
+    tasks = (
+        (pdf, page_no, lang, dpi, poppler_path, use_text_layer, adaptive)
+        for (pdf, _), n_pages in zip(jobs, page_counts)
+        for page_no in range(1, n_pages + 1)
+    )
+    results = ordered_imap(
+        _ocr_task,
+        tasks,
+        workers=workers,
+        initializer=_init_worker,
+        initargs=(pytesseract.pytesseract.tesseract_cmd, cache, _backend, _tessdata_path),
+    )
+
+    total = Counter()
+    for (input_pdf, output_txt), n_pages in zip(jobs, page_counts):
+        stats = Counter()
+        page_reports = []
+
+        def page_texts():
+            for _ in range(n_pages):
+                route, text, report = next(results)
+                stats[route] += 1
+                if report is not None:
+                    page_reports.append(report)
+                yield text
+
+        write_pages(output_txt, page_texts())
+        if adaptive is not None and report_dir:
+            write_adaptive_report(report_dir, input_pdf, page_reports, adaptive)
+        total.update(stats)
+        print(f"✔ Extracted: {os.path.basename(input_pdf)} ({format_route_stats(stats)})")
+    return total
@@ -0,0 +1,269 @@
+import sys
+import bisect
+
+import numpy as np
+
+from pretokenize import MAX_LENGTH, PretokenizedCorpus
+
+
+# Sequence packing and length-bucketed batching over a pretokenize.py corpus.
+#
+# Packing: examples are bin-packed into sequences of at most CAPACITY tokens, best fit
+# decreasing (longest first, each into the fullest pack it still fits). A packed
+# sequence keeps its examples apart: position_ids restart at 0 for every example and
+# cu_seqlens holds the example boundaries, which is what varlen attention kernels and
+# HF's flattening collators use to keep attention inside each example. Labels come
+# from the loss mask, so the first token of an example (a prompt token) is never
+# predicted from the previous example.
+#
+# Bucketing, for the unpacked path: shuffle, cut into pools of BUCKET_BATCHES batches,
+# sort each pool by length, batch it, shuffle the batches. Each batch is padded only
+# to its own longest example.
+#
+# Training side (torch is only imported by the collate functions):
+#   packed:    PackedDataset(finetune_dir, split)   one packed_sequence() per pack of packs.npz
+#              collate_packed(rows)                 (batch, capacity) tensors + position_ids and the
+#                                                   batch's example boundaries for flash_attention_2
+#   unpacked:  UnpackedDataset(finetune_dir, split) one example per item
+#              LengthBucketSampler(lengths, ...)    batch_sampler over bucket_batches(), reshuffled per epoch
+#              collate_padded(rows, pad_id)         padded to the batch's longest example + attention_mask
+# Packed rows are all capacity tokens long, so they need no bucketing: a plain shuffle does.
+# The packed sequences only stay apart with attn_implementation="flash_attention_2":
+# it reads the boundaries from position_ids / cu_seq_lens, sdpa and eager attend
+# across the whole row. Model_finetune/FYP_Model_finetune.ipynb has a Trainer cell
+# for each path.
+#
+#   python packing.py path/to/finetune_dir [split] [batch_size]
+# prints the padding efficiency (real tokens / computed tokens) of every strategy and
+# writes the pack plan to <finetune_dir>/pretokenized/<split>/packs.npz.
+
+CAPACITY = MAX_LENGTH
+BATCH_SIZE = 8
+BUCKET_BATCHES = 50
+SEED = 42
+IGNORE_INDEX = -100
+
+
+def pack_examples(lengths, capacity=CAPACITY):
+    """Best fit decreasing. Returns (order, offsets): pack k holds order[offsets[k]:offsets[k + 1]]."""
+    lengths = np.minimum(np.asarray(lengths), capacity)
+    packs = []        # example ids per pack
+    free = []         # sorted (free tokens, pack id) of the packs that are not full
+    for i in np.argsort(-lengths, kind="stable"):
+        n = int(lengths[i])
+        j = bisect.bisect_left(free, (n, -1))
+        if j < len(free):
+            room, k = free.pop(j)
+        else:
+            room, k = capacity, len(packs)
+            packs.append([])
+        packs[k].append(int(i))
+        if room - n > 0:
+            bisect.insort(free, (room - n, k))
+    order = np.array([i for p in packs for i in p], dtype=np.int64)
+    offsets = np.cumsum([0] + [len(p) for p in packs]).astype(np.int64)
+    return order, offsets
+
+
+def packed_sequence(corpus, example_ids, capacity=CAPACITY, pad_id=0):
+    """One packed training sequence, padded to capacity."""
+    parts = [corpus[int(i)] for i in example_ids]
+    ids = np.concatenate([p["input_ids"] for p in parts]).astype(np.int64)
+    mask = np.concatenate([p["loss_mask"] for p in parts])
+    seq_lens = [len(p["input_ids"]) for p in parts]
+    pad = capacity - len(ids)
+    return {
+        "input_ids": np.concatenate([ids, np.full(pad, pad_id, dtype=np.int64)]),
+        "labels": np.concatenate([np.where(mask == 1, ids, IGNORE_INDEX), np.full(pad, IGNORE_INDEX)]),
+        "position_ids": np.concatenate([np.arange(n) for n in seq_lens] + [np.arange(pad)]),
+        "cu_seqlens": np.cumsum([0] + seq_lens).astype(np.int32),
+    }
+
+
+def bucket_batches(lengths, batch_size=BATCH_SIZE, bucket_batches=BUCKET_BATCHES, seed=SEED):
+    """Lists of example ids; examples of a batch have similar lengths."""
+    rng = np.random.default_rng(seed)
+    lengths = np.asarray(lengths)
+    perm = rng.permutation(len(lengths))
+    pool = batch_size * bucket_batches
+    batches = []
+    for start in range(0, len(perm), pool):
+        ids = perm[start:start + pool]
+        ids = ids[np.argsort(lengths[ids], kind="stable")]
+        batches.extend(ids[i:i + batch_size] for i in range(0, len(ids), batch_size))
+    return [batches[k] for k in rng.permutation(len(batches))]
+
+
+def random_batches(n, batch_size=BATCH_SIZE, seed=SEED):
+    perm = np.random.default_rng(seed).permutation(n)
+    return [perm[i:i + batch_size] for i in range(0, n, batch_size)]
+
+
+def batch_efficiency(lengths, batches) -> float:
+    """Real tokens / tokens computed when every batch is padded to its longest example."""
+    lengths = np.asarray(lengths)
+    computed = sum(len(b) * int(lengths[b].max()) for b in batches)
+    return int(lengths.sum()) / max(computed, 1)
+
+
+def pack_efficiency(lengths, offsets, capacity=CAPACITY) -> float:
+    return int(np.minimum(lengths, capacity).sum()) / max((len(offsets) - 1) * capacity, 1)
+
+
+def load_packs(corpus, capacity=CAPACITY):
+    """(order, offsets) from packs.npz when it was planned for this corpus and capacity, else packed now."""
+    path = corpus.path / "packs.npz"
+    if path.exists():
+        plan = np.load(path)
+        if int(plan["capacity"]) == capacity and str(plan["config"]) == corpus.meta["config"]:
+            return plan["order"], plan["offsets"]
+    return pack_examples(np.asarray(corpus.index[:, 1]), capacity)
+
+
+class PackedDataset:
+    """Map-style dataset of packed sequences: item k is packed_sequence() of pack k."""
+
+    def __init__(self, path, split="train", capacity=CAPACITY, pad_id=0):
+        self.corpus = PretokenizedCorpus(path, split)
+        self.order, self.offsets = load_packs(self.corpus, capacity)
+        self.capacity = capacity
+        self.pad_id = pad_id
+        example_lengths = np.minimum(np.asarray(self.corpus.index[:, 1]), capacity)
+        self.lengths = (np.add.reduceat(example_lengths[self.order], self.offsets[:-1])
+                        if len(self.order) else np.zeros(0, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k):
+        return packed_sequence(self.corpus, self.order[self.offsets[k]:self.offsets[k + 1]], self.capacity, self.pad_id)
+
+
+class UnpackedDataset:
+    """Map-style dataset of single examples, cut to capacity tokens; .lengths feeds LengthBucketSampler."""
+
+    def __init__(self, path, split="train", capacity=CAPACITY):
+        self.corpus = PretokenizedCorpus(path, split)
+        self.capacity = capacity
+        self.lengths = np.minimum(np.asarray(self.corpus.index[:, 1]), capacity)
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def __getitem__(self, i):
+        n = int(self.lengths[i])
+        return {
+            "input_ids": self.corpus[i]["input_ids"][:n].astype(np.int64),
+            "labels": self.corpus.labels(i, IGNORE_INDEX)[:n],
+        }
+
+
+def pad_batch(rows, pad_id=0):
+    """UnpackedDataset rows padded to the longest of them: (batch, longest) arrays + attention_mask."""
+    width = max(len(r["input_ids"]) for r in rows)
+    batch = {
+        "input_ids": np.full((len(rows), width), pad_id, dtype=np.int64),
+        "labels": np.full((len(rows), width), IGNORE_INDEX, dtype=np.int64),
+        "attention_mask": np.zeros((len(rows), width), dtype=np.int64),
+    }
+    for k, r in enumerate(rows):
+        n = len(r["input_ids"])
+        batch["input_ids"][k, :n] = r["input_ids"]
+        batch["labels"][k, :n] = r["labels"]
+        batch["attention_mask"][k, :n] = 1
+    return batch
+
+
+def collate_padded(rows, pad_id=0):
+    """pad_batch() as tensors; bind pad_id with functools.partial for a DataLoader."""
+    import torch
+
+    return {key: torch.from_numpy(value) for key, value in pad_batch(rows, pad_id).items()}
+
+
+class LengthBucketSampler:
+    """batch_sampler for a DataLoader: bucket_batches() of the given lengths, a new shuffle every epoch."""
+
+    def __init__(self, lengths, batch_size=BATCH_SIZE, bucket_batches=BUCKET_BATCHES, seed=SEED):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_batches = bucket_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __len__(self):
+        return -(-len(self.lengths) // self.batch_size)
+
+    def __iter__(self):
+        batches = bucket_batches(self.lengths, self.batch_size, self.bucket_batches, self.seed + self.epoch)
+        self.epoch += 1
+        return (b.tolist() for b in batches)
+
+
+def collate_packed(rows, flash_kwargs=True):
+    """
+    Stacks packed_sequence() rows into (batch, capacity) tensors: input_ids, labels, position_ids.
+    flash_kwargs adds cu_seq_lens_q/k and max_length_q/k (transformers' FlashAttentionKwargs):
+    the example boundaries over the flattened batch, each row's padding as a segment of its own.
+    """
+    import torch
+
+    batch = {key: torch.from_numpy(np.stack([r[key] for r in rows])) for key in ("input_ids", "labels", "position_ids")}
+    if flash_kwargs:
+        capacity = batch["input_ids"].shape[1]
+        cu, max_len = [0], 0
+        for k, r in enumerate(rows):
+            bounds = [int(b) for b in r["cu_seqlens"][1:]]
+            if bounds[-1] < capacity:
+                bounds.append(capacity)
+            prev = 0
+            for b in bounds:
+                cu.append(k * capacity + b)
+                max_len = max(max_len, b - prev)
+                prev = b
+        cu = torch.tensor(cu, dtype=torch.int32)
+        batch.update(cu_seq_lens_q=cu, cu_seq_lens_k=cu, max_length_q=max_len, max_length_k=max_len)
+    return batch
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python packing.py path/to/finetune_dir [split] [batch_size]")
+        sys.exit(1)
+    split = sys.argv[2] if len(sys.argv) > 2 else "train"
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else BATCH_SIZE
+
+    corpus = PretokenizedCorpus(sys.argv[1], split)
+    lengths = np.asarray(corpus.index[:, 1])
+    n = len(lengths)
+    order, offsets = pack_examples(lengths)
+    n_packs = len(offsets) - 1
+    fixed = int(lengths.sum()) / (n * CAPACITY)
+
+    print(f"✔ {split}: {n} examples, {int(lengths.sum())} tokens, mean length {lengths.mean():.0f}")
+    rows = [
+        (f"pad every example to {CAPACITY}", f"{n} rows", fixed),
+        (f"random batches of {batch_size}, pad to longest", f"{-(-n // batch_size)} batches",
+         batch_efficiency(lengths, random_batches(n, batch_size))),
+        (f"length-bucketed batches of {batch_size}", f"{-(-n // batch_size)} batches",
+         batch_efficiency(lengths, bucket_batches(lengths, batch_size))),
+        (f"packed into {CAPACITY}-token sequences", f"{n_packs} seqs", pack_efficiency(lengths, offsets)),
+    ]
+    for name, count, eff in rows:
+        print(f"   {name:<42} {count:>14}   efficiency {eff:6.1%}   x{eff / fixed:.2f} tokens/step vs fixed padding")
+
+    # the packed sequences must hold every example exactly once, within capacity
+    assert np.array_equal(np.sort(order), np.arange(n))
+    pack_len = np.add.reduceat(np.minimum(lengths, CAPACITY)[order], offsets[:-1]) if n else np.zeros(0)
+    assert (pack_len <= CAPACITY).all()
+
+    out_path = corpus.path / "packs.npz"
+    np.savez(out_path, order=order, offsets=offsets, capacity=CAPACITY, config=corpus.meta["config"])
+    print(f"✅ {n_packs} packs -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
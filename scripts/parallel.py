@@ -0,0 +1,30 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def ordered_imap(fn, iterable, workers=None, window=None, initializer=None, initargs=()):
+    """
+    Like map(), but runs fn over a process pool.
+    Results come back in input order and at most `window` tasks are in flight,
+    so memory stays bounded even for very long inputs.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+
+    if workers == 1:
+        # no pool: easier to debug and no pickling overhead
+        if initializer is not None:
+            initializer(*initargs)
+        for item in iterable:
+            yield fn(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as ex:
+        pending = deque()
+        for item in iterable:
+            pending.append(ex.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
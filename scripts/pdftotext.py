@@ -1,6 +1,13 @@
 import pytesseract
 from pdf2image import convert_from_path
 import os
+from collections import Counter
+
+from ocr_cache import OcrPageCache, format_cache_stats
+from ocr_engine import (
+    ocr_image, ocr_pdfs_parallel, ocr_pdf_streaming, format_route_stats, set_ocr_backend,
+    ROUTE_OCR, ROUTE_OCR_CACHED,
+)
 
 
 # CONFIGURATION
@@ -18,8 +25,47 @@ OUTPUT_FOLDER = r"C:\Users\user\Desktop\dataset creation\actsoutput"
 # OCR language (Sinhala = sin)
 LANG = "sin"
 
+# Parallel OCR: pages from all PDFs are spread over this many processes (1 = old sequential loop)
+OCR_WORKERS = os.cpu_count() or 1
+
+# Sequential mode renders this many pages at a time and flushes text as it goes (0 = whole PDF in memory)
+STREAM_WINDOW = 2
+
+# Use the PDF's own Sinhala Unicode text where it is usable and only OCR the other pages
+USE_TEXT_LAYER = True
+
+# OCR backend: "pytesseract" (a tesseract process per page) or "tesserocr"
+# (Tesseract + the sin traineddata stay loaded in every worker, no temp files; same text)
+OCR_BACKEND = "pytesseract"
+TESSDATA_PATH = r"C:\Program Files\Tesseract-OCR\tessdata"
+
+# OCR page cache shared by both OCR scripts (None = no cache)
+OCR_CACHE_DIR = r"C:\Users\user\Desktop\dataset creation\ocr_cache"
+OCR_CACHE_MAX_GB = 5
+
+# Adaptive DPI: OCR at 200 DPI and only re-render pages below 75 mean word confidence at 300 DPI
+# (None = always 300 DPI). A <stem>.adaptive.json report per PDF goes to ADAPTIVE_REPORT_FOLDER.
+ADAPTIVE_DPI = None  # e.g. AdaptiveDpi(low_dpi=200, high_dpi=300, min_conf=75), imported from ocr_engine
+ADAPTIVE_REPORT_FOLDER = os.path.join(OUTPUT_FOLDER, "_adaptive_reports")
+
+
+def pdf_to_text(input_pdf, output_txt, lang="sin", cache=None):
+    if STREAM_WINDOW > 0:
+        stats = ocr_pdf_streaming(
+            input_pdf,
+            output_txt,
+            lang=lang,
+            dpi=300,
+            poppler_path=POPPLER_PATH,
+            window=STREAM_WINDOW,
+            use_text_layer=USE_TEXT_LAYER,
+            cache=cache,
+            adaptive=ADAPTIVE_DPI,
+            report_dir=ADAPTIVE_REPORT_FOLDER
+        )
+        print(f"✔ Extracted: {os.path.basename(input_pdf)} ({format_route_stats(stats)})")
+        return stats
 
-def pdf_to_text(input_pdf, output_txt, lang="sin"):
     pages = convert_from_path(
         input_pdf,
         dpi=300,
@@ -27,20 +73,24 @@ def pdf_to_text(input_pdf, output_txt, lang="sin"):
     )
 
     all_text = []
+    stats = Counter()
     for page in pages:
-        text = pytesseract.image_to_string(page, lang=lang)
+        route, text = ocr_image(page, lang=lang, dpi=300, cache=cache)
+        stats[route] += 1
         all_text.append(text)
 
     with open(output_txt, "w", encoding="utf-8") as f:
         f.write("\n\n".join(all_text))
 
     print(f"✔ Extracted: {os.path.basename(input_pdf)}")
+    return stats
 
 
 def main():
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-    for filename in os.listdir(INPUT_FOLDER):
+    jobs = []
+    for filename in sorted(os.listdir(INPUT_FOLDER)):
         if filename.lower().endswith(".pdf"):
             input_pdf_path = os.path.join(INPUT_FOLDER, filename)
 
@@ -48,9 +98,38 @@ def main():
             output_txt_name = os.path.splitext(filename)[0] + ".txt"
             output_txt_path = os.path.join(OUTPUT_FOLDER, output_txt_name)
 
-            pdf_to_text(input_pdf_path, output_txt_path, LANG)
+            jobs.append((input_pdf_path, output_txt_path))
+
+    set_ocr_backend(OCR_BACKEND, TESSDATA_PATH)
+
+    cache = None
+    if OCR_CACHE_DIR:
+        cache = OcrPageCache(OCR_CACHE_DIR, max_bytes=int(OCR_CACHE_MAX_GB * 1024 ** 3))
+
+    if OCR_WORKERS > 1:
+        stats = ocr_pdfs_parallel(
+            jobs,
+            lang=LANG,
+            dpi=300,
+            poppler_path=POPPLER_PATH,
+            workers=OCR_WORKERS,
+            use_text_layer=USE_TEXT_LAYER,
+            cache=cache,
+            adaptive=ADAPTIVE_DPI,
+            report_dir=ADAPTIVE_REPORT_FOLDER
+        )
+    else:
+        stats = Counter()
+        for input_pdf_path, output_txt_path in jobs:
+            stats.update(pdf_to_text(input_pdf_path, output_txt_path, LANG, cache=cache))
 
     print("\n✅ All PDFs processed successfully.")
+    print(f"Pages: {format_route_stats(stats)}")
+
+    if cache is not None:
+        removed = cache.evict()
+        print(f"OCR cache: {format_cache_stats(stats[ROUTE_OCR_CACHED], stats[ROUTE_OCR], cache)}"
+              + (f", evicted {removed} pages" if removed else ""))
 
 if __name__ == "__main__":
     main()
@@ -4,10 +4,28 @@ import json
 import unicodedata
 from pathlib import Path
 
+from boilerplate import index_fingerprint, load_index, strip_boilerplate
+from compiled_replacer import CompiledReplacer
+from preprocess_runner import run_incremental
+from rule_profiler import profiled_match, profiled_sub
+from sinhala_lexicon import correct_text, lexicon_fingerprint
+
 ACTS_OUTPUT_DIR = "../actsoutput"
 ACTS_PRE_DIR = "../actspre"
 MIN_YEAR = 1991
 
+# Worker processes; outputs whose input and relevant rules are unchanged are skipped.
+# FORCE = True rewrites everything (needed after editing the code, not the lists).
+PREPROCESS_WORKERS = os.cpu_count() or 1
+FORCE = False
+
+# Lexicon-based OCR correction after REPLACEMENTS (build the lexicon with sinhala_lexicon.py first)
+SPELL_CORRECT = False
+LEXICON_PATH = "../lexicon/sinhala_lexicon.bin"
+
+# Lines repeated across the corpus (build with boilerplate.py); without it the first 4 lines are dropped
+BOILERPLATE_INDEX = os.path.join(ACTS_PRE_DIR, "_state", "boilerplate.bin")
+
 
 # Rule-based word fixes (edit this list as you find more)
 
@@ -15,6 +33,7 @@ REPLACEMENTS = [
     ("~~~", " "),
     ("~_~~", " "),
     ("_~~", " "),
+    # Character fixes stay here: they must run after the line drop and before the word rules
     ("—", "-"),
     ("–", "-"),
     ("•", " "),
@@ -52,23 +71,30 @@ REMOVE_LINE_PATTERNS = [
 
 # Normalization + cleanup helpers
 
-def normalize_text(text: str) -> str:
+def normalize_text(text: str, profiler=None) -> str:
 
     text = unicodedata.normalize("NFKC", text)
-    text = re.sub(r"\b59(\d{3})\b", r"20\1", text)
-    text = re.sub(r"\b52(\d{3})\b", r"20\1", text)  
-    text = re.sub(r"\b5(\d{3})\b",  r"2\1",  text)  
-    text = re.sub(r"\b(20\d{2})\s*\?\b", r"\1", text)
-    text = re.sub(r"[=\-]{4,}", " ", text)
-    text = re.sub(r"[~]{2,}", " ", text)
-    text = re.sub(r"[ \t]+", " ", text)
+    text = profiled_sub(profiler, "normalize_text", r"\b59(\d{3})\b", r"20\1", text)
+    text = profiled_sub(profiler, "normalize_text", r"\b52(\d{3})\b", r"20\1", text)  
+    text = profiled_sub(profiler, "normalize_text", r"\b5(\d{3})\b", r"2\1", text)  
+    text = profiled_sub(profiler, "normalize_text", r"\b(20\d{2})\s*\?\b", r"\1", text)
+    text = profiled_sub(profiler, "normalize_text", r"[=\-]{4,}", " ", text)
+    text = profiled_sub(profiler, "normalize_text", r"[~]{2,}", " ", text)
+    text = profiled_sub(profiler, "normalize_text", r"[ \t]+", " ", text)
     return text
 
 
-def apply_replacements(text: str) -> str:
-    for a, b in REPLACEMENTS:
-        text = text.replace(a, b)
-    return text
+# all rules in a few scans, same result as applying them one by one
+_REPLACER = CompiledReplacer(REPLACEMENTS)
+
+
+def apply_replacements(text: str, profiler=None) -> str:
+    if profiler is not None:
+        # rule by rule, so each rule gets its own counts
+        for i, (a, b) in enumerate(REPLACEMENTS):
+            text = profiler.replace(i, a, b, text)
+        return text
+    return _REPLACER(text)
 
 
 def drop_until_nth_newline(text: str, n: int = 4) -> str:
@@ -83,7 +109,7 @@ def drop_until_nth_newline(text: str, n: int = 4) -> str:
     return text
 
 
-def clean_lines(text: str) -> str:
+def clean_lines(text: str, profiler=None) -> str:
     lines = text.splitlines()
     out = []
     for ln in lines:
@@ -94,28 +120,56 @@ def clean_lines(text: str) -> str:
             continue
 
         # remove junk-only lines
-        if any(re.match(pat, ln) for pat in REMOVE_LINE_PATTERNS):
+        if any(profiled_match(profiler, "clean_lines", re.match, pat, ln) for pat in REMOVE_LINE_PATTERNS):
             continue
 
-        if re.fullmatch(r"[\W_]+", ln, flags=re.UNICODE):
+        if profiled_match(profiler, "clean_lines", re.fullmatch, r"[\W_]+", ln, flags=re.UNICODE):
             continue
 
         out.append(ln)
 
     cleaned = "\n".join(out)
-    cleaned = re.sub(r"\n{3,}", "\n\n", cleaned).strip() + "\n"
+    cleaned = profiled_sub(profiler, "clean_lines", r"\n{3,}", "\n\n", cleaned).strip() + "\n"
     return cleaned
 
 
-def preprocess_document(text: str) -> str:
-    text = normalize_text(text)
+def prepare_text(text: str, profiler=None) -> str:
+    text = normalize_text(text, profiler)
+
+    boilerplate = load_index(BOILERPLATE_INDEX)
+    if boilerplate is not None:
+        text = strip_boilerplate(text, boilerplate, profiler)
+    else:
+        text = drop_until_nth_newline(text, n=4)
+    return text
+
 
-    text = drop_until_nth_newline(text, n=4)
-    text = apply_replacements(text)
-    text = clean_lines(text)
+def finish_text(text: str, profiler=None) -> str:
+    # everything after apply_replacements
+    if SPELL_CORRECT:
+        text = correct_text(text, LEXICON_PATH, profiler)
+    text = clean_lines(text, profiler)
     return text
 
 
+def preprocess_document(text: str, profiler=None) -> str:
+    """Pass a rule_profiler.RuleProfiler to collect per-rule hits and timings."""
+    text = prepare_text(text, profiler)
+    text = apply_replacements(text, profiler)
+    text = finish_text(text, profiler)
+    return text
+
+
+def make_record(document_id: str, text: str, year: int) -> dict:
+    return {
+        "document_id": document_id,
+        "raw_text": text,
+        "document_type": "Act",
+        "year": year,
+        "language": "si",
+    }
+
+
 
 def main():
     in_dir = Path(ACTS_OUTPUT_DIR)
@@ -137,26 +191,20 @@ def main():
         print(f"No .txt files (year >= {MIN_YEAR}) found in: {in_dir.resolve()}")
         return
 
-    for fp in txt_files:
-        raw = fp.read_text(encoding="utf-8", errors="replace")
-        cleaned = preprocess_document(raw)
-
-
-        document_id = fp.stem 
-        year = extract_year_from_name(fp.name)
-        doc = {
-            "document_id": document_id,
-            "raw_text": cleaned,
-            "document_type": "Act",
-            "year": year,
-            "language": "si",
-        }
-
-        out_path = out_dir / f"{fp.stem}.json"
-        out_path.write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
-        print(f"✅ {fp.name}  ->  {out_path}")
-
-    print("\nDone. Edit REPLACEMENTS to improve word corrections over time.")
+    jobs = [(fp, out_dir / f"{fp.stem}.json", extract_year_from_name(fp.name)) for fp in txt_files]
+    stats = run_incremental(
+        jobs, out_dir, prepare_text, finish_text, make_record, _REPLACER,
+        config={
+            "REMOVE_LINE_PATTERNS": REMOVE_LINE_PATTERNS,
+            "MIN_YEAR": MIN_YEAR,
+            "LEXICON": lexicon_fingerprint(LEXICON_PATH) if SPELL_CORRECT else None,
+            "BOILERPLATE": index_fingerprint(BOILERPLATE_INDEX),
+        },
+        workers=PREPROCESS_WORKERS, force=FORCE,
+    )
+
+    print(f"\nDone: {stats['written']} written, {stats['unchanged']} unchanged.")
+    print("Edit REPLACEMENTS to improve word corrections over time.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+from parallel import ordered_imap
+
+
+# Parallel, incremental driver shared by preprocess_acts.py and preprocess_extraordinary_gazettes.py.
+#
+# <out_dir>/_state/preprocess_manifest.json keeps, per output JSON:
+#   input   sha256 of the raw .txt bytes
+#   config  hash of the settings every document depends on (REMOVE_LINE_PATTERNS, MIN_YEAR,
+#           lexicon and boilerplate index)
+#   rules   hash of the whole REPLACEMENTS list at the last run
+#   fired   hash of the REPLACEMENTS rules that actually changed this document, in order
+#           (CompiledReplacer.traced: the compiled scans report what they replaced)
+#
+# Same input, config and rules: skipped after hashing the input.
+# Only REPLACEMENTS changed: the document is normalized and traced again, but its
+# output is rewritten only if a different set of rules fires on it.
+# Code changes are not tracked: set FORCE = True in the calling script after editing them.
+
+MANIFEST_NAME = os.path.join("_state", "preprocess_manifest.json")
+
+
+def fingerprint(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def load_manifest(path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(path, entries):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+# Worker side: the pipeline functions and rule hashes are set once per process
+_spec = None
+
+
+def _init_worker(spec):
+    global _spec
+    _spec = spec
+
+
+def _process(job):
+    in_path, out_path, meta, entry = job
+    prepare, finish, make_record, replacer, config_fp, rules_fp = _spec
+
+    raw = Path(in_path).read_bytes()
+    input_fp = hashlib.sha256(raw).hexdigest()
+    same_input = (
+        entry is not None
+        and os.path.exists(out_path)
+        and entry["input"] == input_fp
+        and entry["config"] == config_fp
+    )
+    if same_input and entry["rules"] == rules_fp:
+        return "unchanged", entry
+
+    # same text as Path.read_text(errors="replace"), which uses universal newlines
+    text = raw.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+    text, fired = replacer.traced(prepare(text))
+    new_entry = {"input": input_fp, "config": config_fp, "rules": rules_fp, "fired": fingerprint(fired)}
+    if same_input and entry["fired"] == new_entry["fired"]:
+        return "unchanged", new_entry
+
+    doc = make_record(Path(in_path).stem, finish(text), meta)
+    Path(out_path).write_text(json.dumps(doc, ensure_ascii=False, indent=2), encoding="utf-8")
+    return "written", new_entry
+
+
+def run_incremental(jobs, out_dir, prepare, finish, make_record, replacer, config, workers=None, force=False):
+    """
+    jobs: (input .txt, output .json, meta) triples.
+    prepare/finish are the pipeline steps before and after REPLACEMENTS (replacer: their CompiledReplacer);
+    make_record(document_id, text, meta) builds the output JSON.
+    Returns a Counter of written/unchanged documents.
+    """
+    manifest_path = Path(out_dir) / MANIFEST_NAME
+    entries = {} if force else load_manifest(manifest_path)
+    spec = (prepare, finish, make_record, replacer, fingerprint(config), fingerprint(replacer.source_rules))
+
+    tasks = ((str(i), str(o), meta, entries.get(Path(o).name)) for i, o, meta in jobs)
+    results = ordered_imap(_process, tasks, workers=workers, initializer=_init_worker, initargs=(spec,))
+
+    stats = Counter()
+    try:
+        for (in_path, out_path, _), (status, entry) in zip(jobs, results):
+            entries[Path(out_path).name] = entry
+            stats[status] += 1
+            if status == "written":
+                print(f"✅ {Path(in_path).name}  ->  {out_path}")
+    finally:
+        # keep what finished, so an interrupted run resumes where it stopped
+        save_manifest(manifest_path, entries)
+    return stats
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+from finetune_builder import iter_rows, load_index
+from preprocess_runner import fingerprint
+from prompt_template import format_prompt
+from token_chunker import load_tokenizer
+
+
+# Pre-tokenized export of a finetune_builder output directory, one directory per split
+# (<finetune_dir>/pretokenized/train/, val/, test/).
+#
+# Every row is formatted with the notebook's prompt (prompt_template.format_prompt(input, output)),
+# encoded once with the training tokenizer's local tokenizer.json and appended to flat arrays:
+#   tokens.bin     token ids of all examples back to back (uint32, or uint16 for small vocabularies)
+#   loss_mask.bin  uint8, 1 on the tokens of the target (everything after "<|assistant|>\n")
+#   index.npy      int64 (n, 3): offset into tokens.bin, length, prompt tokens (first token of the target)
+#   meta.json      dtype, counts, and the fingerprint of tokenizer + source + MAX_LENGTH + template
+# The index rows are the attention boundaries: an example never sees tokens outside
+# tokens[offset:offset + length], even when several are packed into one sequence.
+#
+# Examples longer than MAX_LENGTH are cut to their first MAX_LENGTH tokens, like the
+# notebook's tokenizer(..., truncation=True, max_length=1024). No special tokens are
+# added, also like the notebook; set EOS_TOKEN to end every example with one.
+#
+# PretokenizedCorpus(finetune_dir, split) memory-maps the arrays; corpus[i] is a zero-copy view.
+#
+#   python pretokenize.py path/to/tokenizer.json ../Dataset_Acts_Finetune [limit]
+
+MAX_LENGTH = 1024
+EOS_TOKEN = None     # e.g. "<|im_end|>" for Qwen2.5-Instruct
+ENCODE_BATCH = 256
+OUT_NAME = "pretokenized"
+
+
+def encode_rows(tokenizer, rows, max_length=MAX_LENGTH, eos_id=None):
+    """(ids, loss mask) per row; a token is in the loss if it starts inside the target."""
+    prompts = [format_prompt(r["input"]) for r in rows]
+    texts = [p + (r["output"] or "") for p, r in zip(prompts, rows)]
+    for enc, prompt in zip(tokenizer.encode_batch(texts, add_special_tokens=False), prompts):
+        ids = enc.ids
+        starts = [s for s, _ in enc.offsets]
+        mask = [1 if s >= len(prompt) else 0 for s in starts]
+        if eos_id is not None:
+            ids, mask = ids + [eos_id], mask + [1]
+        yield ids[:max_length], mask[:max_length]
+
+
+def pretokenize(finetune_dir, tokenizer_path, max_length=MAX_LENGTH, limit=None, force=False):
+    """{split: meta} after pretokenize_split() of every split; limit applies per split."""
+    return {split: pretokenize_split(finetune_dir, split, tokenizer_path, max_length, limit, force)
+            for split in load_index(finetune_dir)["splits"]}
+
+
+def pretokenize_split(finetune_dir, split, tokenizer_path, max_length=MAX_LENGTH, limit=None, force=False):
+    """Writes <finetune_dir>/pretokenized/<split>/ and returns its meta; skipped if already up to date."""
+    finetune_dir = Path(finetune_dir)
+    out_dir = finetune_dir / OUT_NAME / split
+    tokenizer, tokenizer_fp = load_tokenizer(tokenizer_path)
+    eos_id = tokenizer.token_to_id(EOS_TOKEN) if EOS_TOKEN else None
+    if EOS_TOKEN and eos_id is None:
+        raise ValueError(f"{EOS_TOKEN} is not in {tokenizer_path}")
+
+    source = (finetune_dir / "index.json").read_text(encoding="utf-8")
+    config_fp = fingerprint({
+        "tokenizer": tokenizer_fp,
+        "source": fingerprint(source),
+        "split": split,
+        "max_length": max_length,
+        "eos": EOS_TOKEN,
+        "limit": limit,
+        "template": format_prompt("{doc}", "{target}"),
+    })
+    meta_path = out_dir / "meta.json"
+    if not force and meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("config") == config_fp:
+            return meta
+
+    dtype = np.uint16 if tokenizer.get_vocab_size() <= 1 << 16 else np.uint32
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index = []
+    offset = truncated = 0
+
+    def flush(batch):
+        nonlocal offset, truncated
+        for ids, mask in encode_rows(tokenizer, batch, max_length, eos_id):
+            prompt_tokens = mask.index(1) if 1 in mask else len(mask)
+            tok_f.write(np.asarray(ids, dtype=dtype).tobytes())
+            mask_f.write(np.asarray(mask, dtype=np.uint8).tobytes())
+            index.append((offset, len(ids), prompt_tokens))
+            offset += len(ids)
+            truncated += len(ids) == max_length
+
+    with open(out_dir / "tokens.bin.tmp", "wb") as tok_f, open(out_dir / "loss_mask.bin.tmp", "wb") as mask_f:
+        batch = []
+        for i, row in enumerate(iter_rows(finetune_dir, split)):
+            if limit is not None and i >= limit:
+                break
+            batch.append(row)
+            if len(batch) == ENCODE_BATCH:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    np.save(out_dir / "index.tmp.npy", np.array(index, dtype=np.int64).reshape(-1, 3))
+    os.replace(out_dir / "tokens.bin.tmp", out_dir / "tokens.bin")
+    os.replace(out_dir / "loss_mask.bin.tmp", out_dir / "loss_mask.bin")
+    os.replace(out_dir / "index.tmp.npy", out_dir / "index.npy")
+
+    meta = {
+        "config": config_fp,
+        "tokenizer": str(tokenizer_path),
+        "split": split,
+        "dtype": np.dtype(dtype).name,
+        "examples": len(index),
+        "tokens": offset,
+        "truncated": truncated,
+        "max_length": max_length,
+    }
+    tmp = out_dir / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    os.replace(tmp, meta_path)
+    return meta
+
+
+class PretokenizedCorpus:
+    def __init__(self, path, split="train"):
+        """path: a finetune_builder output directory, or a pretokenized/<split> directory itself."""
+        path = Path(path)
+        if not (path / "meta.json").exists():
+            path = path / OUT_NAME / split
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.index = np.load(path / "index.npy", mmap_mode="r")
+        self.tokens = np.memmap(path / "tokens.bin", dtype=self.meta["dtype"], mode="r")
+        self.loss_mask = np.memmap(path / "loss_mask.bin", dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        offset, length, prompt_tokens = self.index[i]
+        return {
+            "input_ids": self.tokens[offset:offset + length],
+            "loss_mask": self.loss_mask[offset:offset + length],
+            "prompt_tokens": int(prompt_tokens),
+        }
+
+    def labels(self, i, ignore_index=-100):
+        """input_ids with the prompt tokens set to ignore_index (a copy)."""
+        ex = self[i]
+        return np.where(ex["loss_mask"] == 1, ex["input_ids"].astype(np.int64), ignore_index)
+
+
+def main():
+    import time
+
+    if len(sys.argv) < 3:
+        print("Usage: python pretokenize.py path/to/tokenizer.json path/to/finetune_dir [limit]")
+        sys.exit(1)
+    tokenizer_path, finetune_dir = sys.argv[1], sys.argv[2]
+    limit = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    t0 = time.perf_counter()
+    metas = pretokenize(finetune_dir, tokenizer_path, limit=limit)
+    print(f"✔ pre-tokenized in {time.perf_counter() - t0:.1f}s")
+    for split, meta in metas.items():
+        t1 = time.perf_counter()
+        corpus = PretokenizedCorpus(finetune_dir, split)
+        opened = time.perf_counter() - t1
+        lengths = corpus.index[:, 1]
+        print(f"   {split}: {meta['examples']} examples, {meta['tokens']} tokens ({meta['dtype']}), "
+              f"length mean {lengths.mean() if len(lengths) else 0:.0f}, {meta['truncated']} cut at {meta['max_length']}, "
+              f"{int(np.count_nonzero(lengths == corpus.index[:, 2]))} without target, opened in {opened * 1000:.0f} ms")
+    print(f"✅ {Path(finetune_dir) / OUT_NAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# The training prompt of Model_finetune/FYP_Model_finetune.ipynb (format_example),
+# kept here so the chunker can budget for it. Edit both together.
+
+SYSTEM = (
+    "ඔබ ශ්‍රී ලංකාවේ නීතිමය ලේඛන විශ්ලේෂක AI සහායකයෙක්. "
+    "ඔබගේ කාර්යය: සිංහල නීතිමය ලේඛන සාරාංශ කරමින්, නීතිමය විශ්ලේෂණයක් සහ "
+    "පරිශීලකයාට තීරණ ගැනීමට උපකාරී ක්‍රියාමාර්ග/උපදෙස් සපයන්න. "
+    "නීතිමය උපදෙස් ලෙස නොව, සාමාන්‍ය තොරතුරු ලෙස ඉදිරිපත් කරන්න."
+)
+
+
+def format_prompt(doc: str, target: str = "") -> str:
+    return (
+        f"<|system|>\n{SYSTEM}\n"
+        f"<|user|>\n"
+        f"මෙම නීතිමය ලේඛනය කියවා පහත ආකෘතියට අනුව පිළිතුර ලබා දෙන්න:\n\n"
+        f"1) සාරාංශය\n2) නීතිමය විශ්ලේෂණය\n3) ක්‍රියාමාර්ග/තීරණ උපදෙස්\n\n"
+        f"ලේඛනය:\n{doc}\n"
+        f"<|assistant|>\n{target}"
+    )
+
+
+def prompt_overhead(count_tokens) -> int:
+    """Tokens the template adds around the document, for a count_tokens(str) -> int."""
+    return count_tokens(format_prompt(""))
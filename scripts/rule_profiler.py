@@ -0,0 +1,134 @@
+import re
+import time
+from pathlib import Path
+
+from compiled_replacer import overlaps
+
+
+# Instrumentation for preprocess_document(text, profiler=...).
+# Every REPLACEMENTS rule and every regex of normalize_text / regex_cleanup /
+# clean_lines records hits, characters changed and time spent; report() adds
+# the rules worth pruning (no-op, shadowed, never fired).
+#
+#   python rule_profiler.py acts|gazettes
+
+
+class RuleProfiler:
+    def __init__(self):
+        # (stage, rule) -> [hits, chars changed, seconds]
+        self.stats = {}
+
+    def add(self, stage, rule, hits=0, chars=0, seconds=0.0):
+        s = self.stats.setdefault((stage, rule), [0, 0, 0.0])
+        s[0] += hits
+        s[1] += chars
+        s[2] += seconds
+
+    def replace(self, index, a, b, text):
+        t0 = time.perf_counter()
+        hits = text.count(a)
+        text = text.replace(a, b)
+        self.add("replacements", index, hits, hits * len(a) if a != b else 0, time.perf_counter() - t0)
+        return text
+
+    def sub(self, stage, pattern, repl, text, flags=0):
+        t0 = time.perf_counter()
+        out = re.sub(pattern, repl, text, flags=flags)
+        elapsed = time.perf_counter() - t0
+        # counted on a second, untimed pass so the timing stays the plain re.sub cost
+        hits = chars = 0
+        for m in re.finditer(pattern, text, flags=flags):
+            hits += 1
+            if m.expand(repl) != m.group():
+                chars += len(m.group())
+        self.add(stage, pattern, hits, chars, elapsed)
+        return out
+
+    def match(self, stage, fn, pattern, line, flags=0):
+        t0 = time.perf_counter()
+        m = fn(pattern, line, flags=flags)
+        self.add(stage, pattern, 1 if m else 0, len(line) if m else 0, time.perf_counter() - t0)
+        return m
+
+    def report(self, rules) -> str:
+        lines = []
+        for stage in ("normalize_text", "boilerplate", "replacements", "spell_correct", "regex_cleanup", "clean_lines"):
+            rows = [(rule, s) for (st, rule), s in self.stats.items() if st == stage]
+            if not rows:
+                continue
+            total = sum(s[2] for _, s in rows)
+            lines.append(f"\n{stage}: {total:.2f}s")
+            for rule, (hits, chars, secs) in sorted(rows, key=lambda r: -r[1][2]):
+                name = f"#{rule} {rules[rule][0]!r} -> {rules[rule][1]!r}" if stage == "replacements" else repr(rule)
+                lines.append(f"  {secs:8.3f}s  {hits:8d} hits  {chars:10d} chars  {name}")
+
+        flags = flag_rules(rules, self.stats)
+        lines.append(f"\nPrune candidates: {len(flags)} of {len(rules)} rules")
+        for i, reason in flags:
+            lines.append(f"  #{i} {rules[i][0]!r} -> {rules[i][1]!r}: {reason}")
+        return "\n".join(lines)
+
+
+def flag_rules(rules, stats=None):
+    """(index, reason) for rules that cannot, or on this corpus did not, change anything."""
+    flags = []
+    for j, (a, b) in enumerate(rules):
+        if a == b:
+            flags.append((j, "no-op (replaces the text with itself)"))
+            continue
+        # an earlier rule removed every occurrence of a substring of `a`,
+        # and no rule in between can put `a` back together
+        shadow = next(
+            (
+                i for i, (ai, bi) in enumerate(rules[:j])
+                if ai != bi and ai in a and not overlaps(ai, bi)
+                and not any(bk == "" or overlaps(a, bk) for ak, bk in rules[i + 1:j] if ak != bk)
+            ),
+            None,
+        )
+        if shadow is not None:
+            flags.append((j, f"shadowed by #{shadow} {rules[shadow][0]!r}"))
+        elif stats is not None and stats.get(("replacements", j), [0])[0] == 0:
+            flags.append((j, "never fired on this corpus"))
+    return flags
+
+
+def profiled_sub(profiler, stage, pattern, repl, text, flags=0):
+    if profiler is None:
+        return re.sub(pattern, repl, text, flags=flags)
+    return profiler.sub(stage, pattern, repl, text, flags=flags)
+
+
+def profiled_match(profiler, stage, fn, pattern, line, flags=0):
+    if profiler is None:
+        return fn(pattern, line, flags=flags)
+    return profiler.match(stage, fn, pattern, line, flags=flags)
+
+
+def main():
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else "acts"
+    if target == "acts":
+        import preprocess_acts as pre
+    elif target == "gazettes":
+        import preprocess_extraordinary_gazettes as pre
+    else:
+        print("Usage: python rule_profiler.py [acts|gazettes]")
+        sys.exit(1)
+
+    files = sorted(Path(pre.ACTS_OUTPUT_DIR).glob("*.txt"))
+    if not files:
+        print(f"No .txt files found in: {Path(pre.ACTS_OUTPUT_DIR).resolve()}")
+        return
+
+    profiler = RuleProfiler()
+    for fp in files:
+        pre.preprocess_document(fp.read_text(encoding="utf-8", errors="replace"), profiler=profiler)
+
+    print(f"Profiled {len(files)} documents from {pre.ACTS_OUTPUT_DIR}")
+    print(profiler.report(pre.REPLACEMENTS))
+
+
+if __name__ == "__main__":
+    main()
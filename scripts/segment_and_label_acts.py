@@ -2,12 +2,32 @@ import os
 import re
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, List, Tuple
+
+from label_scanner import LabelScanner
+from segment_runner import iter_paragraphs, merge_paragraphs, run_segmentation
+from token_chunker import iter_token_chunks, load_tokenizer, token_budget
 
 IN_DIR = Path("../actspre")          # your output JSONs
 OUT_DIR = Path("../Dataset_Acts_Stage_1")  # chunks + labels
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Documents are segmented in worker processes, at most SEGMENT_WINDOW at a time
+SEGMENT_WORKERS = os.cpu_count() or 1
+SEGMENT_WINDOW = 4 * SEGMENT_WORKERS
+
+# Documents whose JSON is unchanged keep their rows from the previous output file.
+# FORCE = True segments everything again (needed after editing the code, not the settings).
+FORCE = False
+
+# Token-aware chunking: set TOKENIZER_PATH to the training model's local tokenizer.json
+# to pack paragraphs up to MAX_SEQ_LENGTH minus the prompt template and the reserved
+# output tokens, instead of max_chars=900.
+TOKENIZER_PATH = None
+MAX_SEQ_LENGTH = 1024          # max_seq_length in the notebook
+RESERVED_OUTPUT_TOKENS = 256   # room for the target text
+TOKEN_CACHE_DIR = OUT_DIR / "_state" / "token_counts"
+
 
 # 1) Chunking: split into clauses/paras
 
@@ -19,67 +39,86 @@ SINHALA_DEADLINE = re.compile(r"(දින\s*\d+|මාස\s*\d+|අවුරු
 SINHALA_PENALTY = re.compile(r"(දඩ|දඬුවම්|සිරදඬුවම්|නඩු|වරදක්|පනවා)", re.UNICODE)
 SINHALA_PROHIB = re.compile(r"(තහනම්|නොකළ\s*යුතුය|නොහැකි|වළක්වා)", re.UNICODE)
 
-def split_into_chunks(text: str, max_chars: int = 900) -> List[str]:
+LABEL_PATTERNS = {
+    "OBLIGATION": SINHALA_OBLIG,
+    "DEADLINE": SINHALA_DEADLINE,
+    "PENALTY": SINHALA_PENALTY,
+    "PROHIBITION": SINHALA_PROHIB,
+}
+LABEL_SCANNER = LabelScanner(LABEL_PATTERNS)
+
+def is_new_clause(p: str) -> bool:
+    return bool(SECTION_PAT.match(p) or SUBSECTION_PAT.match(p) or LETTER_PAT.match(p))
+
+def iter_chunks(text: str, max_chars: int = 900):
     """
     Keep structure: split by blank lines, then merge until max_chars.
     """
-    parts = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    chunks = []
-    buff = ""
-    for p in parts:
-        new_clause = bool(SECTION_PAT.match(p) or SUBSECTION_PAT.match(p) or LETTER_PAT.match(p))
-        if buff and (len(buff) + len(p) > max_chars or new_clause):
-            chunks.append(buff.strip())
-            buff = p
-        else:
-            buff = (buff + "\n" + p).strip() if buff else p
-    if buff:
-        chunks.append(buff.strip())
-    return chunks
+    return merge_paragraphs(iter_paragraphs(text), max_chars, is_new_clause)
 
-def weak_label(text: str) -> List[str]:
-    labels = []
-    if SINHALA_OBLIG.search(text):
-        labels.append("OBLIGATION")
-    if SINHALA_DEADLINE.search(text):
-        labels.append("DEADLINE")
-    if SINHALA_PENALTY.search(text):
-        labels.append("PENALTY")
-    if SINHALA_PROHIB.search(text):
-        labels.append("PROHIBITION")
+def split_into_chunks(text: str, max_chars: int = 900) -> List[str]:
+    return list(iter_chunks(text, max_chars))
+
+def iter_chunks_by_tokens(text: str, budget: int):
+    """(chunk, token count) pairs packed up to `budget` tokens of TOKENIZER_PATH."""
+    return iter_token_chunks(iter_paragraphs(text), is_new_clause, TOKENIZER_PATH, budget, TOKEN_CACHE_DIR)
+
+def weak_label_spans(text: str) -> Tuple[List[str], Dict[str, List[Tuple[int, int]]]]:
+    """Labels plus the character spans of every pattern hit, per label."""
+    spans = LABEL_SCANNER.scan(text)
+    labels = list(spans)
     if not labels:
         labels.append("OTHER")
-    return labels
+    return labels, spans
+
+def weak_label(text: str) -> List[str]:
+    return weak_label_spans(text)[0]
+
+def doc_lines(path: str) -> List[str]:
+    """JSONL lines of one preprocessed document (runs in a worker)."""
+    fp = Path(path)
+    doc = json.loads(fp.read_text(encoding="utf-8"))
+    text = doc.get("raw_text", "")
+    if not text.strip():
+        return []
+
+    lines = []
+    if TOKENIZER_PATH:
+        budget = token_budget(TOKENIZER_PATH, MAX_SEQ_LENGTH, RESERVED_OUTPUT_TOKENS)
+        chunks = (ch for ch, _ in iter_chunks_by_tokens(text, budget))
+    else:
+        chunks = iter_chunks(text)
+
+    for i, ch in enumerate(chunks):
+        labels, spans = weak_label_spans(ch)
+        row = {
+            "doc_id": doc.get("document_id", fp.stem),
+            "doc_type": doc.get("document_type", "Act"),
+            "year": doc.get("year"),
+            "language": doc.get("language", "si"),
+            "chunk_id": f"{doc.get('document_id', fp.stem)}::{i:04d}",
+            "text": ch,
+            "labels": labels,
+            "spans": spans,
+        }
+        lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+    return lines
 
 def main():
     files = sorted(IN_DIR.glob("*.json"))
-    all_rows: List[Dict] = []
-
-    for fp in files:
-        doc = json.loads(fp.read_text(encoding="utf-8"))
-        text = doc.get("raw_text", "")
-        if not text.strip():
-            continue
-
-        chunks = split_into_chunks(text)
-        for i, ch in enumerate(chunks):
-            row = {
-                "doc_id": doc.get("document_id", fp.stem),
-                "doc_type": doc.get("document_type", "Act"),
-                "year": doc.get("year"),
-                "language": doc.get("language", "si"),
-                "chunk_id": f"{doc.get('document_id', fp.stem)}::{i:04d}",
-                "text": ch,
-                "labels": weak_label(ch),
-            }
-            all_rows.append(row)
 
     out_path = OUT_DIR / "chunks.jsonl"
-    with out_path.open("w", encoding="utf-8") as f:
-        for r in all_rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    config = {
+        "TOKENIZER": load_tokenizer(TOKENIZER_PATH)[1] if TOKENIZER_PATH else None,
+        "MAX_SEQ_LENGTH": MAX_SEQ_LENGTH,
+        "RESERVED_OUTPUT_TOKENS": RESERVED_OUTPUT_TOKENS,
+        "LABEL_PATTERNS": {label: p.pattern for label, p in LABEL_PATTERNS.items()},
+    }
+    stats = run_segmentation(files, out_path, doc_lines, workers=SEGMENT_WORKERS, window=SEGMENT_WINDOW,
+                             config=config, force=FORCE)
 
-    print(f"✅ Created {len(all_rows)} chunks -> {out_path}")
+    print(f"✅ Created {stats['rows']} chunks -> {out_path} "
+          f"({stats['segmented']} documents segmented, {stats['copied']} unchanged)")
 
 if __name__ == "__main__":
     main()
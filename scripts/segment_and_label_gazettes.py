@@ -1,13 +1,34 @@
+import os
 import re
 import json
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, List, Tuple
+
+from label_scanner import LabelScanner
+from segment_runner import iter_paragraphs, merge_paragraphs, run_segmentation
+from token_chunker import iter_token_chunks, load_tokenizer, token_budget
 
 
 IN_DIR = Path("../extraordinary_gazettespre")   # ✅ gazette preprocessed JSONs
 OUT_DIR = Path("../Dataset_Gazettes_Stage_1")    # output chunks + labels
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Documents are segmented in worker processes, at most SEGMENT_WINDOW at a time
+SEGMENT_WORKERS = os.cpu_count() or 1
+SEGMENT_WINDOW = 4 * SEGMENT_WORKERS
+
+# Documents whose JSON is unchanged keep their rows from the previous output file.
+# FORCE = True segments everything again (needed after editing the code, not the settings).
+FORCE = False
+
+# Token-aware chunking: set TOKENIZER_PATH to the training model's local tokenizer.json
+# to pack paragraphs up to MAX_SEQ_LENGTH minus the prompt template and the reserved
+# output tokens, instead of max_chars=1100.
+TOKENIZER_PATH = None
+MAX_SEQ_LENGTH = 1024          # max_seq_length in the notebook
+RESERVED_OUTPUT_TOKENS = 256   # room for the target text
+TOKEN_CACHE_DIR = OUT_DIR / "_state" / "token_counts"
+
 
 
 
@@ -44,6 +65,14 @@ SINHALA_DEADLINE = re.compile(r"(දින\s*\d+|මාස\s*\d+|අවුරු
 SINHALA_PENALTY = re.compile(r"(දඩ|දඬුවම්|සිරදඬුවම්|නඩු|වරදක්|පනවා)", re.UNICODE)
 SINHALA_PROHIB = re.compile(r"(තහනම්|නොකළ\s*යුතුය|නොහැකි|වළක්වා)", re.UNICODE)
 
+LABEL_PATTERNS = {
+    "OBLIGATION": SINHALA_OBLIG,
+    "DEADLINE": SINHALA_DEADLINE,
+    "PENALTY": SINHALA_PENALTY,
+    "PROHIBITION": SINHALA_PROHIB,
+}
+LABEL_SCANNER = LabelScanner(LABEL_PATTERNS)
+
 TABLE_LIKE_PAT = re.compile(r"^(\s*[\d\.,/:\-\s]{10,}|[A-Z]{2,}\s+\d+|\d+\s+\d+\s+\d+)\s*$", re.UNICODE)
 
 def is_table_like_paragraph(p: str) -> bool:
@@ -65,82 +94,89 @@ def is_new_section_start(p: str) -> bool:
         or GAZETTE_SCHEDULE_PAT.match(p)
     )
 
-def split_into_chunks(text: str, max_chars: int = 1100) -> List[str]:
+def iter_chunks(text: str, max_chars: int = 1100):
     """
     Gazette-friendly: split by blank lines, then merge until max_chars.
     Start new chunk when a new notice/part/schedule/section is detected.
     """
-    parts = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
-    chunks: List[str] = []
-    buff = ""
+    return merge_paragraphs(iter_paragraphs(text), max_chars, is_new_section_start)
 
-    for p in parts:
-        new_clause = is_new_section_start(p)
-        if buff and (len(buff) + len(p) > max_chars or new_clause):
-            chunks.append(buff.strip())
-            buff = p
-        else:
-            buff = (buff + "\n" + p).strip() if buff else p
+def split_into_chunks(text: str, max_chars: int = 1100) -> List[str]:
+    return list(iter_chunks(text, max_chars))
 
-    if buff:
-        chunks.append(buff.strip())
-    return chunks
+def iter_chunks_by_tokens(text: str, budget: int):
+    """(chunk, token count) pairs packed up to `budget` tokens of TOKENIZER_PATH."""
+    return iter_token_chunks(iter_paragraphs(text), is_new_section_start, TOKENIZER_PATH, budget, TOKEN_CACHE_DIR)
 
 
-def weak_label(text: str) -> List[str]:
+def weak_label_spans(text: str) -> Tuple[List[str], Dict[str, List[Tuple[int, int]]]]:
+    """Labels plus the character spans of every pattern hit, per label (TABLE_LIKE has none)."""
     labels = []
 
     if is_table_like_paragraph(text):
         labels.append("TABLE_LIKE")
 
-    if SINHALA_OBLIG.search(text):
-        labels.append("OBLIGATION")
-    if SINHALA_DEADLINE.search(text):
-        labels.append("DEADLINE")
-    if SINHALA_PENALTY.search(text):
-        labels.append("PENALTY")
-    if SINHALA_PROHIB.search(text):
-        labels.append("PROHIBITION")
+    spans = LABEL_SCANNER.scan(text)
+    labels.extend(spans)
 
     if not labels:
         labels.append("OTHER")
-    return labels
+    return labels, spans
+
+
+def weak_label(text: str) -> List[str]:
+    return weak_label_spans(text)[0]
+
+def doc_lines(path: str) -> List[str]:
+    """JSONL lines of one preprocessed gazette (runs in a worker)."""
+    fp = Path(path)
+    doc = json.loads(fp.read_text(encoding="utf-8"))
+    text = doc.get("raw_text", "")
+    if not text.strip():
+        return []
+
+    doc_id = doc.get("document_id", fp.stem)
+    lines = []
+    if TOKENIZER_PATH:
+        budget = token_budget(TOKENIZER_PATH, MAX_SEQ_LENGTH, RESERVED_OUTPUT_TOKENS)
+        chunks = (ch for ch, _ in iter_chunks_by_tokens(text, budget))
+    else:
+        chunks = iter_chunks(text)
+
+    for i, ch in enumerate(chunks):
+        labels, spans = weak_label_spans(ch)
+        row = {
+            "doc_id": doc_id,
+            "doc_type": doc.get("document_type", "ExtraordinaryGazette"),  # ✅ default changed
+            "year": doc.get("year"),
+            "language": doc.get("language", "si"),
+            "chunk_id": f"{doc_id}::{i:04d}",
+            "text": ch,
+            "labels": labels,
+            "spans": spans,
+        }
+        lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+    return lines
 
 def main():
     files = sorted(IN_DIR.glob("*.json"))
-    all_rows: List[Dict] = []
 
     if not files:
         print(f"❌ No JSON files found in {IN_DIR.resolve()}")
         return
 
-    for fp in files:
-        doc = json.loads(fp.read_text(encoding="utf-8"))
-        text = doc.get("raw_text", "")
-        if not text.strip():
-            continue
-
-        chunks = split_into_chunks(text)
-        doc_id = doc.get("document_id", fp.stem)
-
-        for i, ch in enumerate(chunks):
-            row = {
-                "doc_id": doc_id,
-                "doc_type": doc.get("document_type", "ExtraordinaryGazette"),  # ✅ default changed
-                "year": doc.get("year"),
-                "language": doc.get("language", "si"),
-                "chunk_id": f"{doc_id}::{i:04d}",
-                "text": ch,
-                "labels": weak_label(ch),
-            }
-            all_rows.append(row)
-
     out_path = OUT_DIR / "gazette_chunks.jsonl"
-    with out_path.open("w", encoding="utf-8") as f:
-        for r in all_rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-    print(f"✅ Created {len(all_rows)} gazette chunks -> {out_path}")
+    config = {
+        "TOKENIZER": load_tokenizer(TOKENIZER_PATH)[1] if TOKENIZER_PATH else None,
+        "MAX_SEQ_LENGTH": MAX_SEQ_LENGTH,
+        "RESERVED_OUTPUT_TOKENS": RESERVED_OUTPUT_TOKENS,
+        "LABEL_PATTERNS": {label: p.pattern for label, p in LABEL_PATTERNS.items()},
+    }
+    stats = run_segmentation(files, out_path, doc_lines, workers=SEGMENT_WORKERS, window=SEGMENT_WINDOW,
+                             config=config, force=FORCE)
+
+    print(f"✅ Created {stats['rows']} gazette chunks -> {out_path} "
+          f"({stats['segmented']} documents segmented, {stats['copied']} unchanged)")
     print("Tip: you can later filter out TABLE_LIKE chunks if they reduce summarization quality.")
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+import os
+import re
+import hashlib
+from collections import Counter
+from pathlib import Path
+
+from parallel import ordered_imap
+from preprocess_runner import fingerprint, load_manifest, save_manifest
+
+
+# Streaming driver shared by segment_and_label_acts.py and segment_and_label_gazettes.py.
+#
+# Documents fan out to a process pool; each worker returns the finished JSONL lines
+# of one document and the parent appends them to the output as they arrive.
+# ordered_imap keeps input order, so chunk_ids come out in the same order as a
+# sequential run, and at most `window` documents are in flight at once.
+# The output is written to <out_path>.tmp and renamed at the end, so an
+# interrupted run never leaves a half-written chunks file behind.
+#
+# Incremental runs: <out dir>/_state/<out name>.manifest.json keeps, per input JSON,
+# the sha256 of its bytes and the byte range of its rows in the output. A document
+# whose input and config are unchanged is not segmented again: its rows are copied
+# as raw bytes from the previous output. Removed documents simply drop out.
+# The manifest also records the output's size and mtime; if the file was touched
+# by anything else, or FORCE is set, everything is segmented again.
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def iter_paragraphs(text: str):
+    r"""Same parts as [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()], lazily."""
+    start = 0
+    for m in PARAGRAPH_BREAK.finditer(text):
+        p = text[start:m.start()].strip()
+        if p:
+            yield p
+        start = m.end()
+    p = text[start:].strip()
+    if p:
+        yield p
+
+
+def merge_paragraphs(paragraphs, max_chars, is_new_clause):
+    """
+    Joins paragraphs with newlines until the next one would pass max_chars or starts a new clause.
+    Keeps the parts in a list with a running length instead of rebuilding one string per paragraph.
+    """
+    parts, size = [], -1  # size == len("\n".join(parts)) once parts is not empty
+    for p in paragraphs:
+        if parts and (size + len(p) > max_chars or is_new_clause(p)):
+            yield "\n".join(parts)
+            parts, size = [], -1
+        parts.append(p)
+        size += len(p) + 1
+    if parts:
+        yield "\n".join(parts)
+
+
+def _output_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length:
+        block = src.read(min(length, 1 << 20))
+        if not block:
+            raise EOFError("previous output is shorter than its manifest")
+        dst.write(block)
+        length -= len(block)
+
+
+def run_segmentation(files, out_path, doc_lines, workers=None, window=None, config=None, force=False) -> Counter:
+    """
+    files: input JSONs in chunk order.
+    doc_lines(path) -> the newline-terminated JSONL lines of one document.
+    config: settings every document's rows depend on (tokenizer, budget, label patterns).
+    Returns a Counter of rows and of segmented/copied documents.
+    """
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{out_path}.tmp"
+    manifest_path = out_path.parent / "_state" / f"{out_path.name}.manifest.json"
+    config_fp = fingerprint(config)
+
+    manifest = {} if force else load_manifest(manifest_path)
+    previous = {}
+    if manifest.get("config") == config_fp and out_path.exists() and manifest.get("output") == _output_stamp(out_path):
+        previous = manifest["documents"]
+
+    # (path, name, input hash, previous entry or None if it has to be segmented)
+    jobs = []
+    for fp in map(Path, files):
+        input_fp = hashlib.sha256(fp.read_bytes()).hexdigest()
+        entry = previous.get(fp.name)
+        jobs.append((fp, input_fp, entry if entry and entry["input"] == input_fp else None))
+
+    stats = Counter()
+    documents = {}
+    changed = (str(fp) for fp, _, entry in jobs if entry is None)
+    results = ordered_imap(doc_lines, changed, workers=workers, window=window)
+    with open(tmp, "wb") as f, (open(out_path, "rb") if previous else open(os.devnull, "rb")) as old:
+        for fp, input_fp, entry in jobs:
+            offset = f.tell()
+            if entry is None:
+                lines = next(results)
+                f.write("".join(lines).encode("utf-8"))
+                rows = len(lines)
+                stats["segmented"] += 1
+            else:
+                _copy_range(old, f, entry["offset"], entry["length"])
+                rows = entry["rows"]
+                stats["copied"] += 1
+            documents[fp.name] = {"input": input_fp, "offset": offset, "length": f.tell() - offset, "rows": rows}
+            stats["rows"] += rows
+    os.replace(tmp, out_path)
+
+    save_manifest(manifest_path, {"config": config_fp, "output": _output_stamp(out_path), "documents": documents})
+    return stats
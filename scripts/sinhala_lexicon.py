@@ -0,0 +1,295 @@
+import os
+import re
+import json
+import mmap
+import struct
+import time
+import hashlib
+from array import array
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+
+# Corpus-derived Sinhala lexicon + SymSpell-style OCR correction.
+#
+# build_lexicon() counts every Sinhala word in the cleaned actspre/ JSONs and
+# precomputes the symmetric-delete index (all strings reachable by deleting up to
+# MAX_EDIT characters from the first PREFIX_LENGTH characters) of the trusted words.
+# A lookup then only deletes characters from the token and probes the index:
+# the work per token is bounded by PREFIX_LENGTH and MAX_EDIT, not by the lexicon size.
+#
+# Everything lives in one binary file that is memory-mapped at load time:
+# hash tables use open addressing (linear probing) over 64-bit blake2b keys, and
+# candidates are always checked with a real edit distance, so collisions are harmless.
+#
+#   python sinhala_lexicon.py          builds LEXICON_PATH from ACTS_PRE_DIR
+
+ACTS_PRE_DIR = "../actspre"
+LEXICON_PATH = "../lexicon/sinhala_lexicon.bin"
+
+MAX_EDIT = 2          # max edit distance of a correction
+PREFIX_LENGTH = 7     # only the start of a word goes into the delete index
+TRUSTED_FREQ = 20     # words seen this often can be correction targets
+RARE_MAX_FREQ = 2     # only tokens seen at most this often get corrected
+MIN_RATIO = 50        # the correction must be this many times more frequent than the token
+MIN_TOKEN_LEN = 4     # shorter tokens are left alone (too many near neighbours)
+LONG_TOKEN_LEN = 8    # shorter tokens may only be off by one edit
+
+WORD_RE = re.compile(r"[\u0D80-\u0DFF\u200c\u200d]+")
+
+_MAGIC = b"SILEX001"
+_HEADER = struct.Struct("<8s8Q")
+
+
+def _key(s: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+    return h or 1  # 0 marks an empty slot
+
+
+def _deletes(word: str, max_edit: int, prefix_length: int) -> set:
+    """The word's prefix and every string reachable by deleting up to max_edit characters from it."""
+    out = {word[:prefix_length]}
+    frontier = set(out)
+    for _ in range(max_edit):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is certain to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _table_size(n: int) -> int:
+    size = 1
+    while size < 2 * n:  # load factor <= 0.5
+        size *= 2
+    return size
+
+
+def _insert(keys, vals, key, val):
+    mask = len(keys) - 1
+    slot = key & mask
+    while keys[slot] != 0:
+        slot = (slot + 1) & mask
+    keys[slot] = key
+    vals[slot] = val
+
+
+def count_words(pre_dir) -> Counter:
+    counts = Counter()
+    for fp in sorted(Path(pre_dir).glob("*.json")):
+        doc = json.loads(fp.read_text(encoding="utf-8"))
+        counts.update(WORD_RE.findall(doc["raw_text"]))
+    return counts
+
+
+def build_lexicon(pre_dir=ACTS_PRE_DIR, path=LEXICON_PATH):
+    counts = count_words(pre_dir)
+    words = [w for w, _ in counts.most_common()]
+
+    offsets, blob = array("Q", [0]), bytearray()
+    for w in words:
+        blob += w.encode("utf-8")
+        offsets.append(len(blob))
+    blob += b"\0" * (-len(blob) % 8)
+    freqs = array("Q", (counts[w] for w in words))
+
+    # exact lookup: every word -> word id + 1
+    exact_keys = array("Q", bytes(8 * _table_size(len(words))))
+    exact_vals = array("Q", bytes(len(exact_keys) * 8))
+    for i, w in enumerate(words):
+        _insert(exact_keys, exact_vals, _key(w), i + 1)
+
+    # delete index: delete key -> run of trusted word ids in `postings`
+    index = {}
+    for i, w in enumerate(words):
+        if counts[w] < TRUSTED_FREQ:
+            break  # most_common order: the rest are rarer
+        for d in _deletes(w, MAX_EDIT, PREFIX_LENGTH):
+            index.setdefault(_key(d), []).append(i)
+    delete_keys = array("Q", bytes(8 * _table_size(len(index))))
+    delete_vals = array("Q", bytes(len(delete_keys) * 8))
+    postings = array("Q")
+    for k, ids in index.items():
+        # (start << 20) | count; no delete key is shared by a million words
+        _insert(delete_keys, delete_vals, k, (len(postings) << 20) | len(ids))
+        postings.extend(ids)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(words), len(blob), len(exact_keys), len(delete_keys),
+                             len(postings), MAX_EDIT, PREFIX_LENGTH, TRUSTED_FREQ))
+        for part in (offsets, freqs, blob, exact_keys, exact_vals, delete_keys, delete_vals, postings):
+            f.write(part)
+    os.replace(tmp, path)
+    return len(words), len(index)
+
+
+class SinhalaLexicon:
+    """Read-only view of a file written by build_lexicon(); nothing is parsed up front."""
+
+    def __init__(self, path=LEXICON_PATH):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, n_words, blob_len, exact_slots, delete_slots, n_postings,
+         self.max_edit, self.prefix_length, self.trusted_freq) = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a lexicon file")
+
+        view = memoryview(self._mm)
+        pos = _HEADER.size
+
+        def take(nbytes, fmt=None):
+            nonlocal pos
+            part = view[pos:pos + nbytes]
+            pos += nbytes
+            return part.cast(fmt) if fmt else part
+
+        self._offsets = take(8 * (n_words + 1), "Q")
+        self._freqs = take(8 * n_words, "Q")
+        self._blob = take(blob_len)
+        self._exact_keys = take(8 * exact_slots, "Q")
+        self._exact_vals = take(8 * exact_slots, "Q")
+        self._delete_keys = take(8 * delete_slots, "Q")
+        self._delete_vals = take(8 * delete_slots, "Q")
+        self._postings = take(8 * n_postings, "Q")
+        self._cache = lru_cache(maxsize=200_000)(self._correct)
+
+    def __len__(self):
+        return len(self._freqs)
+
+    def _probe(self, keys, vals, key) -> int:
+        mask = len(keys) - 1
+        slot = key & mask
+        while True:
+            k = keys[slot]
+            if k == key:
+                return vals[slot]
+            if k == 0:
+                return 0
+            slot = (slot + 1) & mask
+
+    def word(self, i: int) -> str:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def freq(self, word: str) -> int:
+        i = self._probe(self._exact_keys, self._exact_vals, _key(word))
+        # a different word with the same 64-bit key is possible in theory: check it
+        if i and self.word(i - 1) == word:
+            return self._freqs[i - 1]
+        return 0
+
+    def suggest(self, token: str):
+        """(word, distance, freq) of the closest trusted word, most frequent on ties; or None."""
+        limit = self.max_edit if len(token) >= LONG_TOKEN_LEN else min(1, self.max_edit)
+        token_bytes = 3 * len(token)  # every WORD_RE character is 3 bytes in UTF-8
+        best = None
+        seen = set()
+        for d in _deletes(token, limit, self.prefix_length):
+            v = self._probe(self._delete_keys, self._delete_vals, _key(d))
+            if not v:
+                continue
+            start, count = v >> 20, v & 0xFFFFF
+            for j in range(start, start + count):
+                i = self._postings[j]
+                if i in seen:
+                    continue
+                seen.add(i)
+                if abs(self._offsets[i + 1] - self._offsets[i] - token_bytes) > 3 * limit:
+                    continue
+                w = self.word(i)
+                dist = edit_distance(token, w, limit)
+                if dist > limit or dist == 0:
+                    continue
+                cand = (w, dist, self._freqs[i])
+                if best is None or (dist, -cand[2]) < (best[1], -best[2]):
+                    best = cand
+        return best
+
+    def _correct(self, token: str) -> str:
+        if len(token) < MIN_TOKEN_LEN:
+            return token
+        f = self.freq(token)
+        if f > RARE_MAX_FREQ:
+            return token
+        best = self.suggest(token)
+        if best is None or best[2] < MIN_RATIO * max(f, 1):
+            return token
+        return best[0]
+
+    def correct(self, token: str) -> str:
+        return self._cache(token)
+
+    def correct_text(self, text: str) -> str:
+        return WORD_RE.sub(lambda m: self.correct(m.group()), text)
+
+
+_lexicons = {}
+
+
+def load_lexicon(path=LEXICON_PATH) -> SinhalaLexicon:
+    """One shared mmap per path and process."""
+    if path not in _lexicons:
+        _lexicons[path] = SinhalaLexicon(path)
+    return _lexicons[path]
+
+
+def correct_text(text: str, path=LEXICON_PATH, profiler=None) -> str:
+    """Correction stage for preprocess_document; loads the lexicon on first use."""
+    lexicon = load_lexicon(path)
+    if profiler is None:
+        return lexicon.correct_text(text)
+
+    t0 = time.perf_counter()
+    out = lexicon.correct_text(text)
+    elapsed = time.perf_counter() - t0
+    hits = chars = 0
+    for m in WORD_RE.finditer(text):
+        if lexicon.correct(m.group()) != m.group():
+            hits += 1
+            chars += len(m.group())
+    profiler.add("spell_correct", path, hits, chars, elapsed)
+    return out
+
+
+def lexicon_fingerprint(path=LEXICON_PATH) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def main():
+    n_words, n_keys = build_lexicon()
+    size = os.path.getsize(LEXICON_PATH) / 1024 ** 2
+    print(f"✔ {n_words} words, {n_keys} delete keys -> {LEXICON_PATH} ({size:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
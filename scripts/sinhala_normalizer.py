@@ -0,0 +1,95 @@
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+
+# Shared character-level normalization for the Sinhala scripts.
+#
+# SinhalaNormalizer precomputes one table of every single-character mapping
+# (dashes, quotes, bullets, invisible characters) with str.maketrans, once per
+# instance, and applies it after the Unicode normalization form. The table is applied
+# with str.replace for the characters that actually occur: str.translate walks the text
+# one character at a time through a dict once it is not Latin-1, which on actsoutput
+# (30 MB of Sinhala) takes 4.7s against 0.02s for the replace() scans, and 0.12s with
+# one mapped character every 150.
+#
+# Stray ZWJs are dropped in the same call. A ZWJ is kept only when it joins a
+# conjunct: al-lakuna + ZWJ + consonant, as in rakaransaya, yansaya and repaya.
+
+ZWSP = "\u200b"
+ZWJ = "\u200d"
+AL_LAKUNA = "\u0dca"
+
+# starts with the literal ZWJ so the regex engine can jump between them
+_STRAY_ZWJ = re.compile(r"\u200d(?:(?<!\u0dca\u200d)|(?![\u0d9a-\u0dc6]))")
+
+
+def strip_stray_zwj(text: str) -> str:
+    if ZWJ not in text:
+        return text
+    return _STRAY_ZWJ.sub("", text)
+
+
+class SinhalaNormalizer:
+    def __init__(self, char_map=None, form="NFKC", stray_zwj=False):
+        """
+        char_map: {single char: replacement string, or "" to delete}.
+        form: Unicode normalization form applied first, or None.
+        """
+        self.form = form
+        self.stray_zwj = stray_zwj
+        # str.maketrans rejects keys that are not single characters
+        self.translation = str.maketrans(char_map or {})
+        self.table = tuple((chr(c), b or "") for c, b in self.translation.items() if b != chr(c))
+
+    def __call__(self, text: str) -> str:
+        if self.form:
+            text = unicodedata.normalize(self.form, text)
+        for a, b in self.table:
+            if a in text:
+                text = text.replace(a, b)
+        if self.stray_zwj:
+            text = strip_stray_zwj(text)
+        return text
+
+
+# Benchmark against the previous chain on actsoutput
+
+def _legacy_cleaner_chain(text):
+    # sinhala_text_cleaner before the shared normalizer
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace(ZWJ, "").replace(ZWSP, "")
+    replacements = {
+        "–": "-", "—": "-", "“": '"', "”": '"', "‘": "'", "’": "'",
+        "•": "-", "●": "-", "▪": "-"
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    return text
+
+
+def _bench(fn, texts):
+    t0 = time.perf_counter()
+    out = [fn(t) for t in texts]
+    return time.perf_counter() - t0, out
+
+
+def main():
+    from sinhala_text_cleaner import NORMALIZER
+
+    texts = [fp.read_text(encoding="utf-8", errors="replace") for fp in sorted(Path("../actsoutput").glob("*.txt"))]
+    mb = sum(len(t.encode("utf-8")) for t in texts) / 1024 ** 2
+    print(f"Corpus: {len(texts)} files, {mb:.1f} MB")
+
+    slow, ref = _bench(_legacy_cleaner_chain, texts)
+    fast, out = _bench(NORMALIZER, texts)
+    if [o.replace(ZWJ, "") for o in out] != ref:
+        raise SystemExit("❌ the normalizer differs from the old chain beyond the kept ZWJs")
+    kept = sum(o.count(AL_LAKUNA + ZWJ) for o in out)
+    print(f"✔ cleaner chain: {slow:.2f}s -> {fast:.2f}s ({slow / fast:.2f}x); "
+          f"{kept} conjunct ZWJs kept (the old chain deleted every ZWJ)")
+
+
+if __name__ == "__main__":
+    main()
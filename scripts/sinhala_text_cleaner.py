@@ -1,5 +1,17 @@
 import re
-import unicodedata
+
+from sinhala_normalizer import SinhalaNormalizer, ZWSP
+
+# NFC, punctuation and ZWSP in one call; a ZWJ is kept only inside a conjunct (al-lakuna + ZWJ + consonant)
+NORMALIZER = SinhalaNormalizer(
+    char_map={
+        "–": "-", "—": "-", "“": '"', "”": '"', "‘": "'", "’": "'",
+        "•": "-", "●": "-", "▪": "-", ZWSP: "",
+    },
+    form="NFC",
+    stray_zwj=True,
+)
+
 
 def clean_sinhala_legal_text(text):
     """
@@ -11,29 +23,20 @@ def clean_sinhala_legal_text(text):
         str: Cleaned text
     """
 
-    # 1. Unicode normalization + remove invisible characters
-    text = unicodedata.normalize('NFC', text)
-    text = text.replace("\u200d", "").replace("\u200b", "")  # remove ZWJ & ZWSP
+    # 1. Unicode normalization, punctuation and invisible characters (one pass)
+    text = NORMALIZER(text)
 
     # 2. Remove non-content text (headers, footers, page numbers)
     text = re.sub(r'^\s*\d+\s*$', '', text, flags=re.MULTILINE)  # page numbers
     text = re.sub(r'\b(අනුපිටපත්|පිටුව|PAGE|Page|අංකය|Number)\b.*', '', text)  # header/footer keywords
     text = re.sub(r'(ශ්‍රී ලංකා ප්‍රජාතාන්ත්‍රික සමාජවාදී ජනරජය|Democratic Socialist Republic of Sri Lanka)', '', text)
 
-    # 3. Normalize punctuation
-    replacements = {
-        "–": "-", "—": "-", "“": '"', "”": '"', "‘": "'", "’": "'",
-        "•": "-", "●": "-", "▪": "-"
-    }
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-
-    # 4. Sentence/clause segmentation
+    # 3. Sentence/clause segmentation
     # Split on danda (।), full stop, question, exclamation, or colon
     sentences = re.split(r'[\.।:;!?]', text)
     sentences = [s.strip() for s in sentences if s.strip()]
 
-    # 5. Remove duplicates while preserving order
+    # 4. Remove duplicates while preserving order
     seen = set()
     unique_sentences = []
     for s in sentences:
@@ -41,7 +44,7 @@ def clean_sinhala_legal_text(text):
             unique_sentences.append(s)
             seen.add(s)
 
-    # 6. Normalize spacing
+    # 5. Normalize spacing
     cleaned = "\n".join(unique_sentences)
     cleaned = re.sub(r'\s+', ' ', cleaned)  # collapse spaces
     cleaned = re.sub(r' *\n *', '\n', cleaned)  # tidy newlines
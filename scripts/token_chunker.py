@@ -0,0 +1,169 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # only needed for token-aware chunking
+    Tokenizer = None
+
+from prompt_template import prompt_overhead
+
+
+# Token-aware chunking for the segment_and_label scripts.
+#
+# Paragraphs are packed until the next one would pass a token budget:
+#   MAX_SEQ_LENGTH - prompt template overhead - tokens reserved for the target.
+# The tokenizer is the training model's tokenizer.json, loaded from a local file
+# (the HF tokenizers package, no network). No special tokens are added when counting:
+# the template's own markers are part of the overhead.
+#
+# Each paragraph is counted twice: with the "\n" that joins it to the next one and
+# without (when it ends the chunk). Counting the newline with the paragraph matters:
+# the Qwen/GPT-2 pre-tokenizer glues it to a trailing run of non-letters, which in
+# Sinhala includes every vowel sign. A chunk's size is then the sum of these counts,
+# exact whenever the pre-tokenizer never joins a newline to the text after it;
+# `python token_chunker.py` checks it against real encodes. A single paragraph over
+# the budget stays one chunk, like an over-long paragraph in the max_chars mode.
+#
+# The counts are cached per document text and tokenizer file under
+# <cache_dir>/<tokenizer hash>/, so re-chunking with another budget does not tokenize again.
+
+_tokenizers = {}
+
+
+def load_tokenizer(path):
+    """One tokenizer per path and process."""
+    if Tokenizer is None:
+        raise ImportError("Token-aware chunking needs the tokenizers package")
+    path = str(path)
+    if path not in _tokenizers:
+        with open(path, "rb") as f:
+            fp = hashlib.sha256(f.read()).hexdigest()
+        _tokenizers[path] = (Tokenizer.from_file(path), fp)
+    return _tokenizers[path]
+
+
+def count_tokens(tokenizer, texts):
+    return [len(enc.ids) for enc in tokenizer.encode_batch(list(texts), add_special_tokens=False)]
+
+
+@lru_cache(maxsize=None)
+def token_budget(tokenizer_path, max_seq_length, reserved_output_tokens) -> int:
+    tokenizer, _ = load_tokenizer(tokenizer_path)
+    overhead = prompt_overhead(lambda s: count_tokens(tokenizer, [s])[0])
+    budget = max_seq_length - overhead - reserved_output_tokens
+    if budget <= 0:
+        raise ValueError(f"No room for the document: {max_seq_length} - {overhead} (prompt) - {reserved_output_tokens} (output)")
+    return budget
+
+
+class TokenCountCache:
+    def __init__(self, cache_dir, tokenizer_fp):
+        self.dir = os.path.join(cache_dir, tokenizer_fp[:16])
+
+    def _path(self, key):
+        return os.path.join(self.dir, key[:2], key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, counts):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(counts, f)
+        os.replace(tmp, path)
+
+
+def _count_paragraphs(tokenizer, paragraphs):
+    alone = count_tokens(tokenizer, paragraphs)
+    joined = count_tokens(tokenizer, (p + "\n" for p in paragraphs))
+    return [list(c) for c in zip(alone, joined)]
+
+
+def paragraph_counts(paragraphs, tokenizer_path, cache_dir=None):
+    """
+    [tokens of p, tokens of p + "\n"] per paragraph,
+    from the cache when this exact document was counted before.
+    """
+    tokenizer, fp = load_tokenizer(tokenizer_path)
+    if cache_dir is None:
+        return _count_paragraphs(tokenizer, paragraphs)
+
+    cache = TokenCountCache(cache_dir, fp)
+    key = hashlib.sha256("\0".join(paragraphs).encode("utf-8")).hexdigest()
+    counts = cache.get(key)
+    if counts is None or len(counts) != len(paragraphs):
+        counts = _count_paragraphs(tokenizer, paragraphs)
+        cache.put(key, counts)
+    return counts
+
+
+def pack_paragraphs(paragraphs, counts, budget, is_new_clause):
+    """Yields (chunk text, token count): paragraphs joined by newlines while they fit the budget."""
+    parts, closed, last = [], 0, None  # closed: tokens of every part with its "\n"
+    for p, (alone, joined) in zip(paragraphs, counts):
+        if parts and (closed + alone > budget or is_new_clause(p)):
+            yield "\n".join(parts), closed - last[1] + last[0]
+            parts, closed = [], 0
+        parts.append(p)
+        closed += joined
+        last = (alone, joined)
+    if parts:
+        yield "\n".join(parts), closed - last[1] + last[0]
+
+
+def iter_token_chunks(paragraphs, is_new_clause, tokenizer_path, budget, cache_dir=None):
+    paragraphs = list(paragraphs)
+    if not paragraphs:
+        return iter(())
+    counts = paragraph_counts(paragraphs, tokenizer_path, cache_dir)
+    return pack_paragraphs(paragraphs, counts, budget, is_new_clause)
+
+
+def main():
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python token_chunker.py path/to/tokenizer.json [acts|gazettes]")
+        sys.exit(1)
+    tokenizer_path = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else "acts"
+    if target == "acts":
+        import segment_and_label_acts as seg
+    elif target == "gazettes":
+        import segment_and_label_gazettes as seg
+    else:
+        print("Usage: python token_chunker.py path/to/tokenizer.json [acts|gazettes]")
+        sys.exit(1)
+
+    tokenizer, _ = load_tokenizer(tokenizer_path)
+    budget = token_budget(tokenizer_path, seg.MAX_SEQ_LENGTH, seg.RESERVED_OUTPUT_TOKENS)
+    docs = [json.loads(fp.read_text(encoding="utf-8")).get("raw_text", "") for fp in sorted(Path(seg.IN_DIR).glob("*.json"))]
+    print(f"{len(docs)} documents, budget {budget} tokens per chunk")
+
+    seg.TOKENIZER_PATH = tokenizer_path
+    for label, size in (("cold cache", budget), ("warm cache", budget), ("warm cache, new budget", budget // 2)):
+        t0 = time.perf_counter()
+        chunks = [c for text in docs for c in seg.iter_chunks_by_tokens(text, size)]
+        print(f"  {label}: {len(chunks)} chunks in {time.perf_counter() - t0:.2f}s")
+
+    exact = count_tokens(tokenizer, (c for c, _ in chunks))
+    wrong = sum(1 for (_, n), m in zip(chunks, exact) if n != m)
+    over = sum(1 for m in exact if m > size)
+    fill = sum(exact) / (len(exact) * size)
+    print(f"{'✔' if not wrong else '❌'} {wrong} chunk counts differ from a real encode; "
+          f"{over} single paragraphs over budget; mean fill {fill:.0%}")
+
+
+if __name__ == "__main__":
+    main()
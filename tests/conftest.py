@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the scripts are flat modules that import each other by name
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS))
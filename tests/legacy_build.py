@@ -0,0 +1,101 @@
+import json
+import re
+
+
+# The Build_*_Finetune_jsonl.py logic before chunk_quality.py and finetune_builder.py:
+# one chunk at a time, the filters in their original order, rows written to one
+# finetune.jsonl. Kept as the reference the batch filters and the sharded output
+# are compared against.
+
+# ---- gazettes ----
+
+GAZETTE_META_PAT = re.compile(
+    r"(ගැසට්|අතිරේක|අති විශේෂ|extraordinary|gazette|පත්‍රයේ|මුද්‍රණය|මුද්‍රණ දෙපාර්තමේන්තුව|"
+    r"government printer|printed|ප්‍රකාශයට පත්|පළ කරන ලදී|අංක\s*\d+\/\d+|No\.\s*\d+\/\d+)",
+    re.IGNORECASE
+)
+HEADER_FOOTER_PAT = re.compile(
+    r"(ශ්‍රී ලංකා ප්‍රජාතාන්ත්‍රික සමාජවාදී ජනරජය|democratic socialist republic|"
+    r"gazz?ette of the democratic socialist republic|the gazette of sri lanka)",
+    re.IGNORECASE
+)
+PAGE_NO_PAT = re.compile(r"^\s*(\d+|page\s*\d+)\s*$", re.IGNORECASE)
+NUMSYM_LINE_PAT = re.compile(r"^[\d\W_]+$")
+
+
+def gazette_is_table_like(text):
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if len(lines) < 5:
+        return False
+    numericish = sum(1 for ln in lines if NUMSYM_LINE_PAT.fullmatch(ln) is not None)
+    very_short = sum(1 for ln in lines if len(ln) <= 3 or PAGE_NO_PAT.fullmatch(ln))
+    return (numericish / len(lines) >= 0.45) or (very_short / len(lines) >= 0.35)
+
+
+def looks_like_pure_metadata(text):
+    t = re.sub(r"\s+", " ", (text or "")).strip()
+    if not t:
+        return True
+    if len(t) < 160:
+        if GAZETTE_META_PAT.search(t):
+            return True
+    meta_hits = len(GAZETTE_META_PAT.findall(t)) + len(HEADER_FOOTER_PAT.findall(t))
+    sentence_marks = len(re.findall(r"[။\.]\s", t))
+    if meta_hits >= 2 and sentence_marks <= 1 and len(t) < 350:
+        return True
+    return False
+
+
+def too_noisy(text):
+    t = text or ""
+    bad = sum(t.count(ch) for ch in ["�", "�", "�"])
+    return (bad >= 3 and len(t) < 400)
+
+
+def gazette_reason(text):
+    """The first filter that drops the chunk, None to keep it."""
+    text_stripped = (text or "").strip()
+    if len(text_stripped) < 120:
+        return "too_short"
+    if too_noisy(text_stripped):
+        return "too_noisy"
+    if gazette_is_table_like(text_stripped):
+        return "table_like"
+    if looks_like_pure_metadata(text_stripped):
+        return "pure_metadata"
+    return None
+
+
+# ---- acts ----
+
+def acts_is_table_like(text):
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    if len(lines) < 4:
+        return False
+    numericish = sum(1 for ln in lines if re.fullmatch(r"[\d\W_]+", ln))
+    return numericish / len(lines) >= 0.6
+
+
+def acts_reason(text):
+    if len(text) < 120:
+        return "too_short"
+    if acts_is_table_like(text):
+        return "table_like"
+    return None
+
+
+# ---- finetune.jsonl ----
+
+def finetune_lines(in_path, reason, tasks, skip=frozenset()):
+    """The old finetune.jsonl lines: two rows per kept chunk, instruction inline."""
+    out = []
+    with open(in_path, encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            text = r.get("text", "") or ""
+            if reason(text) is not None or r["chunk_id"] in skip:
+                continue
+            for task, spec in tasks.items():
+                out.append(json.dumps({"id": r["chunk_id"], "task": task, "instruction": spec["instruction"],
+                                       "input": r["text"], "output": spec["output"]}, ensure_ascii=False))
+    return out
@@ -0,0 +1,21 @@
+from boilerplate import build_index, line_key, load_index, strip_boilerplate
+
+MASTHEAD = "ශ්‍රී ලංකා ප්‍රජාතාන්ත්‍රික සමාජවාදී ජනරජයේ ගැසට් පත්‍රය අති විශෙෂ"
+FOOTER = "Printed at the Department of Government Printing, Sri Lanka."
+NAMES = ["අ", "ආ", "ඇ", "ඈ", "ඉ", "ඊ", "උ", "ඌ", "එ", "ඒ", "ඔ", "ඕ"]
+
+
+def test_index_counts_the_lines_strip_boilerplate_sees(tmp_path):
+    # an OCR page ends in a form feed, so the footer shares its "\n" line with the next
+    # page's first line: only the masthead is a whole line that strip_boilerplate can drop
+    docs = [f"{MASTHEAD}\nවගන්තිය {name}\n{FOOTER}\f{name} පිටුව\nඅවසානය\n" for name in NAMES]
+    for i, text in enumerate(docs):
+        (tmp_path / f"doc{i:02d}.txt").write_text(text, encoding="utf-8")
+
+    index_path = str(tmp_path / "_state" / "boilerplate.bin")
+    build_index(sorted(tmp_path.glob("*.txt")), lambda t: t, index_path, workers=1)
+    index = load_index(index_path)
+
+    assert index == {line_key(MASTHEAD)}
+    for text in docs:
+        assert strip_boilerplate(text, index) == text.split("\n", 1)[1]
@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import legacy_build
+from chunk_quality import (
+    acts_drop_masks, features, first_reason, gazette_drop_masks, row_features,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# filter edge cases the sampled chunks do not all reach
+EDGE_CASES = [
+    "",
+    "   \n\t ",
+    "� OCR � noise � " + "අ" * 120,
+    "�" * 3 + " x" * 300,
+    "\n".join(["12", "Page 4", "--", "..", "3", "a line of ordinary text here"] * 4),
+    "\n".join(["1,200.00", "3/4", "- 5 -", "ආණ්ඩුවේ නියමය පරිදි"] * 10),
+    "ගැසට් පත්‍රය අංක 2187/26 extraordinary printed at the government printer " * 2,
+    "The Gazette of Sri Lanka. No. 12/3 මුද්‍රණය " + "ප" * 200,
+    "a\r\nb\rc\x0bd\x0ce\x1cf\x85g h " + "ක" * 150,
+    "\x00﷐ separators inside a chunk " + "ත" * 130,
+]
+
+
+def load_texts(name):
+    with open(FIXTURES / name, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f] + EDGE_CASES
+
+
+def reasons(masks, texts):
+    names = list(masks)
+    return [names[i] if i >= 0 else None for i in first_reason(masks, len(texts))]
+
+
+@pytest.mark.parametrize("name", ["acts_chunks.jsonl", "gazette_chunks.jsonl"])
+def test_batch_features_match_row_features(name):
+    texts = load_texts(name)
+    # batch_size 7 puts batch boundaries between the chunks
+    assert np.allclose(features(texts, batch_size=7), np.array([row_features(t) for t in texts], dtype=float))
+
+
+def test_gazette_masks_match_old_filters():
+    texts = load_texts("gazette_chunks.jsonl")
+    expected = [legacy_build.gazette_reason(t) for t in texts]
+    assert reasons(gazette_drop_masks(features(texts)), texts) == expected
+    assert {"too_short", "too_noisy", "table_like", "pure_metadata", None} <= set(expected)
+
+
+def test_acts_masks_match_old_filters():
+    texts = load_texts("acts_chunks.jsonl")
+    expected = [legacy_build.acts_reason(t) for t in texts]
+    assert reasons(acts_drop_masks(features(texts, keywords=False)), texts) == expected
+    assert {"too_short", "table_like", None} <= set(expected)
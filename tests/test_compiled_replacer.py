@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from compiled_replacer import CompiledReplacer, _conflicts, apply_sequential, apply_traced, plan_stages
+
+ALPHABET = "ab~-"
+
+
+def random_rules(rng, n):
+    rules = []
+    for _ in range(n):
+        if rules and rng.random() < 0.2:
+            rules.append(rng.choice(rules))  # repeated rules
+            continue
+        a = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 3)))
+        b = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 3)))
+        rules.append((a, b))
+    return rules
+
+
+def random_text(rng):
+    return "".join(rng.choice(ALPHABET + "x") for _ in range(rng.randint(0, 40)))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_traced_matches_apply_traced(seed):
+    rng = random.Random(seed)
+    rules = random_rules(rng, rng.randint(1, 12))
+    replacer = CompiledReplacer(rules)
+    for _ in range(20):
+        text = random_text(rng)
+        assert replacer(text) == apply_sequential(text, rules)
+        assert replacer.traced(text) == apply_traced(text, rules)
+
+
+def test_traced_reports_every_firing_of_a_repeated_rule():
+    rules = [("a", "b"), ("b", "a"), ("a", "b")]
+    assert CompiledReplacer(rules).traced("xa") == ("xb", rules)
+    assert CompiledReplacer(rules[:2]).traced("xa") == ("xa", rules[:2])
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_stages_commute_internally(seed):
+    rng = random.Random(1000 + seed)
+    rules = [r for r in random_rules(rng, rng.randint(1, 12)) if r[0] != r[1]]
+    stages = plan_stages(rules)
+    assert sorted(r for stage in stages for r in stage) == sorted(rules)
+    for stage in stages:
+        for i, x in enumerate(stage):
+            for y in stage[i + 1:]:
+                assert not _conflicts(x, y) and not _conflicts(y, x)
+
+    # rules of a stage may run in any order
+    for _ in range(20):
+        text = random_text(rng)
+        shuffled = []
+        for stage in stages:
+            stage = list(stage)
+            rng.shuffle(stage)
+            shuffled.extend(stage)
+        assert apply_sequential(text, shuffled) == apply_sequential(text, rules)
+
+
+def test_sinhala_rule_chains():
+    # a later rule relies on the output of an earlier one
+    rules = [("අනි", "අති"), ("අති විශෙෂ", "අති විශේෂ"), ("ෙෙ", "ෛ"), ("​", ""), ("ප​න", "පන")]
+    replacer = CompiledReplacer(rules)
+    for text in ["අනි විශෙෂ", "ෙ​ෙ", "ප​නත අනි", "අනිඅනි විශෙෂ ෙෙෙ"]:
+        assert replacer(text) == apply_sequential(text, rules)
+        assert replacer.traced(text) == apply_traced(text, rules)
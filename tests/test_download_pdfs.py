@@ -0,0 +1,145 @@
+import os
+
+import pytest
+
+import download_pdfs
+from download_pdfs import DownloadManifest, download_pdf, part_paths
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(f"HTTP {self.status_code}")
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+class FakeServer:
+    """Serves {url: (body, etag)} with Range / If-Range / If-None-Match like a static file server."""
+
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        body, etag = self.files[url]
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304)
+        full = {"ETag": etag, "Content-Length": str(len(body))}
+        if "Range" not in headers or headers.get("If-Range") != etag:
+            return FakeResponse(200, body, full)
+        start = int(headers["Range"].split("=")[1].rstrip("-"))
+        if start >= len(body):
+            return FakeResponse(416, headers={"Content-Range": f"bytes */{len(body)}"})
+        rest = body[start:]
+        return FakeResponse(206, rest, {"ETag": etag, "Content-Length": str(len(rest)),
+                                        "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+
+
+URL = "https://example.org/docs/2020/act.pdf"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(download_pdfs, "backoff_delay", lambda attempt: 0)
+
+
+def write_part(tmp_path, url, data, etag):
+    part_path, meta_path = part_paths(url, str(tmp_path), os.path.basename(url))
+    with open(part_path, "wb") as f:
+        f.write(data)
+    download_pdfs.save_part_validators(meta_path, {"ETag": etag})
+    return part_path, meta_path
+
+
+def test_resume_appends_the_missing_bytes(tmp_path):
+    body = bytes(range(256)) * 40
+    server = FakeServer({URL: (body, '"v1"')})
+    part_path, meta_path = write_part(tmp_path, URL, body[:3000], '"v1"')
+
+    assert download_pdf(URL, str(tmp_path), server)
+    assert server.requests == [{"Range": "bytes=3000-", "If-Range": '"v1"'}]
+    assert (tmp_path / "act.pdf").read_bytes() == body
+    assert not os.path.exists(part_path) and not os.path.exists(meta_path)
+
+
+def test_changed_pdf_is_downloaded_again_not_spliced(tmp_path):
+    old, new = b"A" * 5000, b"B" * 4000
+    server = FakeServer({URL: (new, '"v2"')})
+    write_part(tmp_path, URL, old[:3000], '"v1"')
+
+    assert download_pdf(URL, str(tmp_path), server)
+    assert server.requests[0]["If-Range"] == '"v1"'
+    assert (tmp_path / "act.pdf").read_bytes() == new
+
+
+def test_416_with_a_complete_part_finishes_without_refetching(tmp_path):
+    body = b"%PDF" + b"x" * 2000
+    server = FakeServer({URL: (body, '"v1"')})
+    write_part(tmp_path, URL, body, '"v1"')
+
+    assert download_pdf(URL, str(tmp_path), server)
+    assert len(server.requests) == 1
+    assert (tmp_path / "act.pdf").read_bytes() == body
+
+
+def test_416_with_an_oversized_part_starts_over(tmp_path):
+    body = b"%PDF" + b"x" * 2000
+    server = FakeServer({URL: (body, '"v1"')})
+    write_part(tmp_path, URL, body + b"junk", '"v1"')
+
+    assert download_pdf(URL, str(tmp_path), server)
+    assert "Range" not in server.requests[1]
+    assert (tmp_path / "act.pdf").read_bytes() == body
+
+
+def test_urls_with_the_same_file_name_keep_separate_files(tmp_path):
+    other = "https://example.org/docs/2021/act.pdf"
+    server = FakeServer({URL: (b"first" * 100, '"a"'), other: (b"second" * 100, '"b"')})
+    manifest = DownloadManifest(str(tmp_path / "manifest.json"))
+
+    assert download_pdf(URL, str(tmp_path), server, manifest)
+    assert download_pdf(other, str(tmp_path), server, manifest)
+    first, second = manifest.entry(URL)["file"], manifest.entry(other)["file"]
+    assert first == "act.pdf" and second != first
+    assert (tmp_path / first).read_bytes() == b"first" * 100
+    assert (tmp_path / second).read_bytes() == b"second" * 100
+
+    # a re-run keeps each URL on its own file and only revalidates
+    manifest.save()
+    manifest = DownloadManifest(str(tmp_path / "manifest.json"))
+    server.requests.clear()
+    assert download_pdf(other, str(tmp_path), server, manifest)
+    assert download_pdf(URL, str(tmp_path), server, manifest)
+    assert [r.get("If-None-Match") for r in server.requests] == ['"b"', '"a"']
+
+
+def test_changed_content_releases_the_old_hash(tmp_path):
+    other = "https://example.org/mirror/copy.pdf"
+    server = FakeServer({URL: (b"v1" * 500, '"a1"'), other: (b"v1" * 500, '"c"')})
+    manifest = DownloadManifest(str(tmp_path / "manifest.json"))
+    assert download_pdf(URL, str(tmp_path), server, manifest)
+
+    # URL now serves new content in place of the old file
+    server.files[URL] = (b"v2" * 500, '"a2"')
+    assert download_pdf(URL, str(tmp_path), server, manifest)
+    assert download_pdf(other, str(tmp_path), server, manifest)
+
+    assert not manifest.entry(other).get("duplicate_of")
+    assert (tmp_path / manifest.entry(other)["file"]).read_bytes() == b"v1" * 500
+    assert (tmp_path / "act.pdf").read_bytes() == b"v2" * 500
@@ -0,0 +1,44 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("accelerate")
+pytest.importorskip("peft")
+pytest.importorskip("tokenizers")
+transformers = pytest.importorskip("transformers")
+
+import export_cpu_model as ecm  # noqa: E402
+from prompt_template import format_prompt  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("tiny")
+    base, adapter = ecm.make_tiny(workdir)
+    export_dir = workdir / "export"
+    info = ecm.export(base, adapter, export_dir)
+    return base, adapter, export_dir, info
+
+
+def test_export_info(exported):
+    _, _, export_dir, info = exported
+    assert (export_dir / ecm.WEIGHTS_NAME).exists()
+    # merging the adapter does not change the function, the saved artifact reproduces the int8 model
+    assert info["max_abs_diff_merged_vs_unmerged"] < 1e-4
+    assert info["max_abs_diff_reloaded_vs_int8"] == 0.0
+
+
+def test_load_exported_matches_unmerged(exported):
+    base, adapter, export_dir, _ = exported
+    tokenizer = transformers.AutoTokenizer.from_pretrained(export_dir)
+    probe = tokenizer(format_prompt(ecm.BENCH_DOC), return_tensors="pt")
+
+    model = ecm.load_exported(export_dir)
+    assert not any(type(m) is torch.nn.Linear for m in model.modules())
+    assert not any(p.is_meta for p in model.parameters())
+
+    int8 = ecm._logits(model, probe)
+    ref = ecm._logits(ecm.load_unmerged(base, adapter), probe)
+    assert int8.shape == ref.shape
+    # int8 weights: within a few quantization steps of the fp32 logits (a random tiny model
+    # has near-uniform logits, so the argmax is too fragile to compare)
+    assert float((int8 - ref).abs().max()) <= 0.1 * float(ref.abs().max())
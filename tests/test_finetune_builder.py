@@ -0,0 +1,80 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import Build_Acts_Finetune_jsonl as build_acts
+import Build_gazettes_Finetune_jsonl as build_gazettes
+import finetune_builder
+import legacy_build
+from chunk_quality import acts_drop_masks, gazette_drop_masks
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+CORPORA = {
+    "acts": (FIXTURES / "acts_chunks.jsonl", build_acts.TASKS, acts_drop_masks, False, legacy_build.acts_reason),
+    "gazettes": (FIXTURES / "gazette_chunks.jsonl", build_gazettes.TASKS, gazette_drop_masks, True,
+                 legacy_build.gazette_reason),
+}
+
+
+def flat_lines(out_dir, split=None):
+    return [json.dumps(row, ensure_ascii=False) for row in finetune_builder.iter_rows(out_dir, split)]
+
+
+@pytest.fixture
+def small_shards(monkeypatch):
+    # a few KB per shard, so the fixture spreads over several shards
+    monkeypatch.setattr(finetune_builder.ShardWriter.__init__, "__defaults__", (20_000,))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("corpus", list(CORPORA))
+def test_flattened_shards_equal_old_finetune_jsonl(tmp_path, small_shards, corpus, workers):
+    in_path, tasks, drop_masks, keywords, reason = CORPORA[corpus]
+    index = finetune_builder.build(in_path, tmp_path, tasks, drop_masks, keywords=keywords,
+                                   splits={"train": 1.0}, workers=workers)
+
+    expected = legacy_build.finetune_lines(in_path, reason, tasks)
+    assert flat_lines(tmp_path) == expected
+    assert index["rows"] == len(expected)
+    assert len(index["splits"]["train"]["shards"]) > 1
+
+
+def test_duplicates_are_skipped(tmp_path):
+    in_path, tasks, drop_masks, keywords, reason = CORPORA["gazettes"]
+    with open(in_path, encoding="utf-8") as f:
+        ids = [json.loads(line)["chunk_id"] for line in f]
+    skip = frozenset(ids[::3])
+    finetune_builder.build(in_path, tmp_path, tasks, drop_masks, keywords=keywords, duplicates=skip,
+                           splits={"train": 1.0}, workers=1)
+    assert flat_lines(tmp_path) == legacy_build.finetune_lines(in_path, reason, tasks, skip)
+
+
+@pytest.mark.parametrize("corpus", list(CORPORA))
+def test_splits_are_disjoint_by_document(tmp_path, corpus):
+    import gzip
+
+    in_path, tasks, drop_masks, keywords, reason = CORPORA[corpus]
+    index = finetune_builder.build(in_path, tmp_path, tasks, drop_masks, keywords=keywords, workers=1)
+    assert list(index["splits"]) == list(finetune_builder.SPLITS)
+
+    docs = {}
+    for name, split in index["splits"].items():
+        docs[name] = set()
+        for shard in split["shards"]:
+            with gzip.open(tmp_path / shard["file"], "rt", encoding="utf-8") as f:
+                docs[name].update(json.loads(line)["doc_id"] for line in f)
+        assert len(docs[name]) == split["documents"]
+        assert all(finetune_builder.assign_split(d) == name for d in docs[name])
+
+    names = list(docs)
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            assert not docs[a] & docs[b], f"{a} and {b} share documents"
+    # the fixture documents reach every split
+    assert all(docs.values())
+
+    # every old row lands in exactly one split
+    rows = [line for name in names for line in flat_lines(tmp_path, name)]
+    assert sorted(rows) == sorted(legacy_build.finetune_lines(in_path, reason, tasks))
@@ -0,0 +1,51 @@
+import json
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+import segment_and_label_acts
+import segment_and_label_gazettes
+from label_scanner import LabelScanner
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+PIECES = ["ab", "a|b", "(ab|ba)", "a+", "b?a", "[ab]c", "c*", "(a)(b)?", r"\bab", "a(?=b)", "(?:ca|a)b"]
+
+
+def finditer_spans(patterns, text):
+    spans = {}
+    for label, p in patterns.items():
+        p = re.compile(p) if isinstance(p, str) else p
+        found = [m.span() for m in p.finditer(text)]
+        if found:
+            spans[label] = found
+    return spans
+
+
+def load_texts(name):
+    with open(FIXTURES / name, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f]
+
+
+@pytest.mark.parametrize("module, fixture", [
+    (segment_and_label_acts, "acts_chunks.jsonl"),
+    (segment_and_label_gazettes, "gazette_chunks.jsonl"),
+])
+def test_script_labels_match_finditer(module, fixture):
+    for text in load_texts(fixture):
+        assert module.LABEL_SCANNER.scan(text) == finditer_spans(module.LABEL_PATTERNS, text)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_random_patterns_match_finditer(seed):
+    rng = random.Random(seed)
+    patterns = {}
+    for i in range(rng.randint(1, 5)):
+        src = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 2)))
+        patterns[f"L{i}"] = re.compile(src, re.IGNORECASE) if rng.random() < 0.2 else src
+    scanner = LabelScanner(patterns)
+    for _ in range(20):
+        text = "".join(rng.choice("abcAB ") for _ in range(rng.randint(0, 30)))
+        assert scanner.scan(text) == finditer_spans(patterns, text)
@@ -0,0 +1,53 @@
+import shutil
+
+import pytest
+
+pytesseract = pytest.importorskip("pytesseract")
+pytest.importorskip("tesserocr")
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+import ocr_engine  # noqa: E402
+
+if shutil.which(pytesseract.pytesseract.tesseract_cmd) is None:
+    pytest.skip("tesseract binary not found", allow_module_level=True)
+
+LINES = [
+    "GAZETTE EXTRAORDINARY No. 2187/26",
+    "PART I : SECTION (I) - GENERAL",
+    "Notice under section 12 of Act No. 10 of 2001.",
+    "Colombo, 14th July 2020.",
+]
+
+
+@pytest.fixture
+def page():
+    """A printed page: a few lines of black text on white, like a 300 DPI scan."""
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:  # Pillow < 10.1: fixed-size bitmap font
+        font = ImageFont.load_default()
+    image = Image.new("L", (1700, 600), 255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(LINES):
+        draw.text((80, 80 + 110 * i), line, fill=0, font=font)
+    return image.convert("RGB")
+
+
+@pytest.fixture
+def backend():
+    yield ocr_engine.set_ocr_backend
+    ocr_engine.set_ocr_backend("pytesseract")
+
+
+def test_tesserocr_text_equals_pytesseract(page, backend):
+    lang = "eng"
+    backend("pytesseract")
+    expected = ocr_engine.tesseract_image_to_string(page, lang=lang)
+    assert expected == pytesseract.image_to_string(page, lang=lang)
+
+    backend("tesserocr")
+    assert ocr_engine.tesseract_image_to_string(page, lang=lang) == expected
+    # the second call reuses the loaded API
+    assert ocr_engine.tesseract_image_to_string(page, lang=lang) == expected
+    assert ocr_engine.ocr_image(page, lang=lang) == (ocr_engine.ROUTE_OCR, expected)
+    assert expected.strip()
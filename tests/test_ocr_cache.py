@@ -0,0 +1,45 @@
+import pytest
+from PIL import Image
+
+import ocr_cache
+import ocr_engine
+from ocr_cache import OcrPageCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # the key only needs a stable version string, not a tesseract install
+    monkeypatch.setattr(ocr_cache, "_tesseract_version", "5.3.0")
+    return OcrPageCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def recognize(monkeypatch):
+    calls = []
+
+    def fake(image, lang):
+        calls.append(image.size)
+        return "පිටුව\n\f", 71.5
+
+    monkeypatch.setattr(ocr_engine, "_recognize_with_confidence", fake)
+    return calls
+
+
+def test_low_dpi_pass_is_cached_with_its_confidence(cache, recognize):
+    image = Image.new("L", (200, 100), 255)
+    first = ocr_engine.ocr_image_with_confidence(image, "sin", dpi=150, cache=cache)
+    second = ocr_engine.ocr_image_with_confidence(image, "sin", dpi=150, cache=cache)
+
+    assert first == (ocr_engine.ROUTE_OCR, "පිටුව\n\f", 71.5)
+    assert second == (ocr_engine.ROUTE_OCR_CACHED, "පිටුව\n\f", 71.5)
+    assert len(recognize) == 1
+
+
+def test_confidence_entries_are_keyed_apart(cache, recognize):
+    image = Image.new("L", (200, 100), 255)
+    ocr_engine.ocr_image_with_confidence(image, "sin", dpi=150, cache=cache)
+
+    # another DPI, or the plain-text entry of the same image, is a different key
+    assert ocr_engine.ocr_image_with_confidence(image, "sin", dpi=300, cache=cache)[0] == ocr_engine.ROUTE_OCR
+    assert cache.get(cache.key(image, 150, "sin")) is None
+    assert len(recognize) == 2
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pytest
+
+from packing import (
+    IGNORE_INDEX, LengthBucketSampler, UnpackedDataset, batch_efficiency, pad_batch, random_batches,
+)
+
+
+@pytest.fixture
+def corpus_dir(tmp_path):
+    """A pretokenize.py split directory with 400 examples of 20 to 1100 tokens."""
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(20, 1100, size=400)
+    prompts = lengths // 2
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    tokens = rng.integers(1, 30000, size=int(lengths.sum())).astype(np.uint16)
+    mask = np.concatenate([np.arange(n) >= p for n, p in zip(lengths, prompts)]).astype(np.uint8)
+    tokens.tofile(tmp_path / "tokens.bin")
+    mask.tofile(tmp_path / "loss_mask.bin")
+    np.save(tmp_path / "index.npy", np.stack([offsets, lengths, prompts], axis=1).astype(np.int64))
+    (tmp_path / "meta.json").write_text(json.dumps({"config": "test", "dtype": "uint16"}), encoding="utf-8")
+    return tmp_path
+
+
+def test_unpacked_examples_are_cut_to_capacity(corpus_dir):
+    ds = UnpackedDataset(corpus_dir, capacity=1024)
+    assert ds.lengths.max() == 1024
+    for i in range(len(ds)):
+        ex = ds[i]
+        assert len(ex["input_ids"]) == len(ex["labels"]) == ds.lengths[i]
+        prompt = ds.corpus[i]["prompt_tokens"]
+        assert (ex["labels"][:prompt] == IGNORE_INDEX).all()
+        assert np.array_equal(ex["labels"][prompt:], ex["input_ids"][prompt:])
+
+
+def test_bucketed_batches_need_less_padding(corpus_dir):
+    ds = UnpackedDataset(corpus_dir, capacity=1024)
+    sampler = LengthBucketSampler(ds.lengths, batch_size=8, bucket_batches=10)
+    batches = list(sampler)
+
+    # every example once, and each batch close to its own longest example
+    assert sorted(i for b in batches for i in b) == list(range(len(ds)))
+    assert len(batches) == len(sampler)
+    spread = np.mean([np.ptp(ds.lengths[b]) for b in batches])
+    random_spread = np.mean([np.ptp(ds.lengths[b]) for b in random_batches(len(ds), 8)])
+    assert spread < random_spread / 4
+    assert batch_efficiency(ds.lengths, batches) > batch_efficiency(ds.lengths, random_batches(len(ds), 8)) + 0.2
+
+    # pad_batch pads to the batch's longest example only
+    total = 0
+    for b in batches:
+        padded = pad_batch([ds[i] for i in b], pad_id=0)
+        assert padded["input_ids"].shape == (len(b), ds.lengths[b].max())
+        assert padded["attention_mask"].sum() == ds.lengths[b].sum()
+        total += padded["input_ids"].size
+    assert total < len(ds) * 1024 * 0.7
+
+    # a new order every epoch
+    assert list(sampler) != batches
@@ -0,0 +1,19 @@
+import pytest
+
+import preprocess_acts
+import preprocess_extraordinary_gazettes
+
+
+@pytest.mark.parametrize("module", [preprocess_acts, preprocess_extraordinary_gazettes])
+def test_char_rules_run_after_the_line_drop(module):
+    # the first four lines are dropped before the dash and replacement-char rules run
+    text = "x\ny\nz\nw\nabc —————— def a � b\n"
+    assert module.preprocess_document(text) == "abc ------ def a   b\n"
+
+
+@pytest.mark.parametrize("module", [preprocess_acts, preprocess_extraordinary_gazettes])
+def test_tilde_rules_run_before_the_char_rules(module):
+    # "~​~​~" only becomes "~~~" once the ZWSP rule has run, so the
+    # earlier "~~~" rule must leave it alone
+    text = "x\ny\nz\nw\nabc ~​~​~ def\n"
+    assert module.preprocess_document(text) == "abc ~~~ def\n"
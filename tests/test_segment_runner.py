@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from segment_runner import iter_paragraphs, run_segmentation
+
+
+def doc_lines(path):
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    return [json.dumps({"doc_id": doc["id"], "chunk_id": f"{doc['id']}::{i}", "text": p}, ensure_ascii=False) + "\n"
+            for i, p in enumerate(iter_paragraphs(doc["text"]))]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    src = tmp_path / "in"
+    src.mkdir()
+    for i in range(6):
+        text = "\n\n".join(f"{i} වගන්තිය {j}: පනත ප්‍රකාරව නියමය" for j in range(i + 1))
+        (src / f"doc{i}.json").write_text(json.dumps({"id": f"doc{i}", "text": text}, ensure_ascii=False),
+                                          encoding="utf-8")
+    return sorted(src.glob("*.json"))
+
+
+def test_unchanged_documents_are_copied(tmp_path, inputs):
+    out_path = tmp_path / "out" / "chunks.jsonl"
+    first = run_segmentation(inputs, out_path, doc_lines, workers=1)
+    assert first["segmented"] == 6 and first["rows"] == 21
+    before = out_path.read_text(encoding="utf-8").splitlines()
+
+    edited = inputs[3]
+    edited.write_text(json.dumps({"id": "doc3", "text": "නව පෙළ\n\nදෙවන ඡේදය"}, ensure_ascii=False),
+                      encoding="utf-8")
+    second = run_segmentation(inputs, out_path, doc_lines, workers=1)
+    assert (second["segmented"], second["copied"], second["rows"]) == (1, 5, 19)
+
+    after = out_path.read_text(encoding="utf-8").splitlines()
+    assert [ln for ln in after if '"doc3"' not in ln] == [ln for ln in before if '"doc3"' not in ln]
+
+    full_path = tmp_path / "full" / "chunks.jsonl"
+    run_segmentation(inputs, full_path, doc_lines, workers=2, force=True)
+    assert out_path.read_bytes() == full_path.read_bytes()
+
+
+def test_config_change_or_touched_output_segments_everything(tmp_path, inputs):
+    out_path = tmp_path / "chunks.jsonl"
+    run_segmentation(inputs, out_path, doc_lines, workers=1, config={"budget": 512})
+    assert run_segmentation(inputs, out_path, doc_lines, workers=1, config={"budget": 512})["copied"] == 6
+    assert run_segmentation(inputs, out_path, doc_lines, workers=1, config={"budget": 256})["segmented"] == 6
+
+    with open(out_path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert run_segmentation(inputs, out_path, doc_lines, workers=1, config={"budget": 256})["segmented"] == 6
+
+    # a removed document drops out of the output
+    stats = run_segmentation(inputs[1:], out_path, doc_lines, workers=1, config={"budget": 256})
+    assert (stats["copied"], stats["rows"]) == (5, 20)
+    assert '"doc0"' not in out_path.read_text(encoding="utf-8")
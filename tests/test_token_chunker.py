@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+import pytest
+
+tokenizers = pytest.importorskip("tokenizers")
+
+import token_chunker  # noqa: E402
+from segment_runner import iter_paragraphs  # noqa: E402
+from token_chunker import count_tokens, iter_token_chunks, load_tokenizer, paragraph_counts  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_texts(name):
+    with open(FIXTURES / name, encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f]
+
+
+@pytest.fixture(scope="module")
+def tokenizer_path(tmp_path_factory):
+    """A small byte-level BPE (the GPT-2 / Qwen family) trained on the fixture chunks."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+
+    tok = Tokenizer(models.BPE())
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    trainer = trainers.BpeTrainer(vocab_size=2000, initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    tok.train_from_iterator(load_texts("acts_chunks.jsonl") + load_texts("gazette_chunks.jsonl"), trainer)
+    path = tmp_path_factory.mktemp("tokenizer") / "tokenizer.json"
+    tok.save(str(path))
+    return str(path)
+
+
+def documents():
+    # the fixture chunks of one document, joined back with paragraph breaks
+    docs = {}
+    with open(FIXTURES / "acts_chunks.jsonl", encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            docs.setdefault(r["doc_id"], []).append(r["text"])
+    return ["\n\n".join(parts) for parts in docs.values()]
+
+
+def never_new(p):
+    return False
+
+
+def test_cached_counts_equal_a_direct_count(tmp_path, tokenizer_path, monkeypatch):
+    tokenizer, _ = load_tokenizer(tokenizer_path)
+    docs = [list(iter_paragraphs(text)) for text in documents()]
+    direct = [[[a, j] for a, j in zip(count_tokens(tokenizer, ps), count_tokens(tokenizer, (p + "\n" for p in ps)))]
+              for ps in docs]
+
+    assert [paragraph_counts(ps, tokenizer_path) for ps in docs] == direct
+    assert [paragraph_counts(ps, tokenizer_path, tmp_path) for ps in docs] == direct
+
+    # the second pass reads every document from the cache
+    def no_recount(*args):
+        raise AssertionError("counted again")
+
+    monkeypatch.setattr(token_chunker, "_count_paragraphs", no_recount)
+    assert [paragraph_counts(ps, tokenizer_path, tmp_path) for ps in docs] == direct
+
+
+@pytest.mark.parametrize("budget", [64, 256])
+def test_chunk_counts_equal_a_real_encode(tmp_path, tokenizer_path, budget):
+    tokenizer, _ = load_tokenizer(tokenizer_path)
+    for text in documents():
+        paragraphs = list(iter_paragraphs(text))
+        chunks = list(iter_token_chunks(paragraphs, never_new, tokenizer_path, budget, tmp_path))
+        assert "\n".join(c for c, _ in chunks) == "\n".join(paragraphs)
+        exact = count_tokens(tokenizer, (c for c, _ in chunks))
+        assert [n for _, n in chunks] == exact
+        # only a single paragraph may pass the budget
+        assert all(n <= budget or c in paragraphs for c, n in chunks)